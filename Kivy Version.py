@@ -1,12 +1,33 @@
+import json
+import os
+import time
+
+# Startup-time mode: MEDICINE_REMINDER_STARTUP_TIME=1 prints time-to-first-frame
+# as a JSON line and exits; any other value is taken as a file to append it to.
+STARTUP_T0 = time.perf_counter()
+STARTUP_TIME_MODE = os.environ.get("MEDICINE_REMINDER_STARTUP_TIME")
+
 import kivy
 
 kivy.require('2.2.1')
 
-import sqlite3
-import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from plyer import notification
+
+from archive import Archiver
+from claims import OccurrenceClaims
+from database import ChangeWatcher, Database
+from doselog import DoseLog, adherence, format_adherence, recent_days
+from exporter import export_file
+from list_model import ReminderListModel, ReminderPager
+from notifier import ConsoleBackend, NotificationDispatcher, PlyerBackend
+from outbox import NotificationOutbox
+from recurrence import Recurrence, list_row, scheduler_entries
+from scheduler import ReminderScheduler
+from snooze import SNOOZE_MINUTES, Snoozer, split_key
+from store import ReminderStore
+from stats import stats, timer
 
 
 from kivy.app import App
@@ -15,46 +36,64 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
-from kivy.uix.button import Button
-from kivy.properties import StringProperty, ListProperty, NumericProperty, ColorProperty
+from kivy.properties import StringProperty, NumericProperty, ColorProperty, BooleanProperty
 from kivy.clock import Clock
-from kivy.metrics import dp
-from kivy.graphics import Color, Rectangle
 
-from kivy.uix.textinput import TextInput
-from kivy.core.window import Window
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivymd.app import MDApp
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDFlatButton
-from kivymd.uix.pickers import MDDatePicker
-from kivymd.uix.label import MDLabel
-from kivymd.uix.gridlayout import MDGridLayout
+# KV widgets (MDLabel, MDGridLayout, RecycleView, ...) resolve through the
+# Factory; the date picker, MDDialog and the notification backend are
+# imported on first use to keep them off the startup path.
 
 # ----------------- DATABASE SETUP -----------------
-DB_NAME = "medicine_reminder.db"
-
-
-def setup_database():
-    try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS medicines (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            date TEXT NOT NULL,
-            time TEXT NOT NULL
-        )
-        """)
-        conn.commit()
-    except Exception as e:
-        print(f"Database setup error: {e}")
-    finally:
-        if conn:
-            conn.close()
+db = Database()
+store = ReminderStore(db)  # list pages and the scheduler read from memory
+db_ready = threading.Event()
+
+# All database work from the screen runs on this one worker, in the order it
+# was submitted, so the event loop never waits on a lock or slow storage.  A
+# single thread also keeps writes ordered and gives the ChangeWatcher the
+# same reader connection on every poll.
+io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reminder-io")
+
+
+def run_io(work, on_done=None, on_error=None):
+    """Run ``work()`` on the I/O worker; ``on_done(result)`` or
+    ``on_error(exception)`` is then called on the Kivy thread.  Returns the
+    future, which can be cancelled while it is still queued."""
+    def finished(future):
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            if on_error is None:
+                print(f"Background task error: {e}")
+            else:
+                Clock.schedule_once(lambda dt, e=e: on_error(e), 0)
+            return
+        if on_done is not None:
+            Clock.schedule_once(lambda dt: on_done(result), 0)
+
+    future = io_executor.submit(work)
+    future.add_done_callback(finished)
+    return future
 
 
-setup_database()
+def start_database_setup(on_ready):
+    # Schema creation/migration is the first job on the I/O worker, so the
+    # first frame doesn't wait on disk and everything after it queues behind.
+    def run():
+        try:
+            db.setup()
+            store.load()
+        except Exception as e:
+            print(f"Database setup error: {e}")
+        db_ready.set()
+        on_ready()
+
+    io_executor.submit(run)
+
 
 # ----------------- KIVY UI DEFINITION (KV Language) -----------------
 KV = """
@@ -77,7 +116,7 @@ KV = """
         cols: 2
         spacing: dp(10)
         size_hint_y: None
-        height: dp(250)
+        height: dp(300)
 
         MDLabel:
             text: 'Medicine Name:'
@@ -109,40 +148,99 @@ KV = """
             on_text: root.time_input = self.text
             multiline: False
 
+        MDLabel:
+            text: 'Repeat:'
+
+        TextInput:
+            id: repeat_input
+            hint_text: 'e.g., daily, every 8 hours, mon, wed, fri'
+            text: root.repeat_input
+            on_text: root.repeat_input = self.text
+            multiline: False
+
     MDGridLayout:
         cols: 2
         spacing: dp(10)
         size_hint_y: None
-        height: dp(100)
+        height: dp(300)
         padding: [0, dp(10), 0, dp(10)]
 
         Button:
             text: '➕ Add Medicine'
+            disabled: root.busy
             on_release: root.add_medicine()
             background_color: 0.2, 0.8, 0.2, 1
 
         Button:
             text: '🔄 Update Selected'
+            disabled: root.busy
             on_release: root.update_medicine()
             background_color: 0.8, 0.6, 0.2, 1
 
         Button:
             text: '🗑️ Delete Selected'
+            disabled: root.busy
             on_release: root.delete_medicine()
             background_color: 0.8, 0.2, 0.2, 1
 
         Button:
             text: 'Refresh List'
-            on_release: root.refresh_reminder_view()
+            on_release: root.sync_changes()
             background_color: 0.5, 0.5, 0.5, 1
 
+        Button:
+            text: 'Mark Taken'
+            on_release: root.mark_dose('taken')
+            background_color: 0.2, 0.7, 0.5, 1
+
+        Button:
+            text: 'Skip Dose'
+            on_release: root.mark_dose('skipped')
+            background_color: 0.7, 0.5, 0.3, 1
+
+        Button:
+            text: 'Snooze'
+            on_release: root.mark_dose('snoozed')
+            background_color: 0.3, 0.5, 0.8, 1
+
+        Button:
+            text: 'Adherence'
+            on_release: root.show_adherence()
+            background_color: 0.3, 0.5, 0.7, 1
+
+        Button:
+            text: 'Export'
+            on_release: root.show_export()
+            background_color: 0.5, 0.4, 0.6, 1
+
+        Button:
+            text: 'Diagnostics'
+            on_release: root.show_diagnostics()
+            background_color: 0.4, 0.4, 0.6, 1
+
     MDLabel:
         text: 'Upcoming Reminders:'
         size_hint_y: None
         height: self.texture_size[1]
 
+    BoxLayout:
+        size_hint_y: None
+        height: dp(40)
+        spacing: dp(10)
+
+        TextInput:
+            id: search_input
+            hint_text: 'Search medicines'
+            on_text: root.on_search_text(self.text)
+            multiline: False
+
+        MDLabel:
+            text: root.search_status
+            size_hint_x: None
+            width: dp(180)
+
     GridLayout:
-        cols: 4
+        cols: 5
         spacing: dp(1)
         size_hint_y: None
         height: dp(35)
@@ -161,24 +259,30 @@ KV = """
         MDLabel:
             text: 'Time'
             bold: True
+        MDLabel:
+            text: 'Repeat'
+            bold: True
 
-    ScrollView:
+    RecycleView:
+        id: reminder_list
+        viewclass: 'ReminderRow'
         size_hint: (1, 1)
         do_scroll_x: False
-        GridLayout:
-            id: reminder_list
-            cols: 1 
-            spacing: dp(1) 
-            size_hint_y: None 
-            height: self.minimum_height 
+        RecycleBoxLayout:
+            orientation: 'vertical'
+            default_size: None, dp(35)
+            default_size_hint: 1, None
+            size_hint_y: None
+            height: self.minimum_height
+            spacing: dp(1)
             padding: dp(5)
 
 <ReminderRow>:
-    cols: 4 
+    cols: 5 
     size_hint_y: None
     height: dp(35)
 
-    row_color: (1, 1, 1, 1) 
+    row_color: (0.1, 0.5, 0.8, 0.5) if self.selected else ((0.95, 0.95, 0.95, 1) if self.index % 2 == 0 else (1, 1, 1, 1))
 
     canvas.before:
         Color:
@@ -187,8 +291,6 @@ KV = """
             pos: self.pos
             size: self.size
 
-    on_touch_down: self.parent.parent.parent.select_row(self) if self.collide_point(*args[1].pos) else None
-
     MDLabel:
         id: row_id
         text: str(root.item_id)
@@ -203,25 +305,37 @@ KV = """
     MDLabel:
         id: row_time
         text: root.item_time
+    MDLabel:
+        id: row_repeat
+        text: root.item_repeat
 
 """
 
-Builder.load_string(KV)
-
 
 # ----------------- KIVY WIDGET CLASSES -----------------
 
-class ReminderRow(GridLayout):
+class ReminderRow(RecycleDataViewBehavior, GridLayout):
     item_id = NumericProperty(0)
     item_name = StringProperty('')
     item_date = StringProperty('')
     item_time = StringProperty('')
+    item_repeat = StringProperty('')
+    start_date = StringProperty('')
+    start_time = StringProperty('')
+    due_at = NumericProperty(0)
+    selected = BooleanProperty(False)
+    index = NumericProperty(0)
     row_color = ColorProperty([1, 1, 1, 1])
 
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        return super().refresh_view_attrs(rv, index, data)
+
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos):
-            parent = self.parent.parent.parent
-            parent.select_row(self)
+            # RecycleBoxLayout -> RecycleView -> ReminderScreen
+            screen = self.parent.parent.parent
+            screen.select_row(self.item_id)
         return super().on_touch_down(touch)
 
 
@@ -229,14 +343,44 @@ class ReminderScreen(BoxLayout):
     medicine_name = StringProperty('')
     selected_date = StringProperty('')
     time_input = StringProperty('')
+    repeat_input = StringProperty('')
 
     selected_reminder_id = NumericProperty(0)
-    selected_row_widget = None
+    search_status = StringProperty('')
+    busy = BooleanProperty(False)  # a write is in flight; its buttons are disabled
+
+    SEARCH_DELAY = 0.25  # seconds of typing pause before the search runs
+    SEARCH_LIMIT = 500
+    CHANGE_POLL_INTERVAL = 1.0  # seconds between cross-process change checks
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.list_model = ReminderListModel(self.ids.reminder_list.data)
+        self.pager = ReminderPager(store)
+        self.ids.reminder_list.bind(scroll_y=self.on_list_scroll)
+        self.search_text = ''
+        self._search_event = Clock.create_trigger(lambda dt: self.refresh_reminder_view(), self.SEARCH_DELAY)
+        # The list's contents generation: results of a refresh or page that
+        # was overtaken by a newer refresh are dropped
+        self._list_version = 0
+        self._refresh = None
+        self._page_pending = False
+        self._sync_pending = False
+        self.due_prompts = {}  # reminder id -> open "Medicine Due" popup
         self.start_reminder_checker()
-        Clock.schedule_once(lambda dt: self.refresh_reminder_view(), 0)
+        self.watcher = None
+        start_database_setup(lambda: Clock.schedule_once(lambda dt: self.on_database_ready(), 0))
+
+    def on_database_ready(self):
+        self.refresh_reminder_view()
+        # Created on the I/O worker: data_version is tracked per connection
+        run_io(lambda: ChangeWatcher(db), lambda watcher: setattr(self, 'watcher', watcher))
+        Clock.schedule_interval(lambda dt: self.sync_changes(), self.CHANGE_POLL_INTERVAL)
+        # Hourly background move of long-past reminders into the archive table
+        self.archiver = Archiver(db)
+        self.archiver.start()
+        # Sends what was never delivered and fires doses missed while closed
+        self.outbox.start()
 
     def show_popup(self, title, message):
         popup = Popup(
@@ -248,6 +392,8 @@ class ReminderScreen(BoxLayout):
         popup.open()
 
     def show_date_picker(self):
+        from kivymd.uix.pickers import MDDatePicker
+
         try:
             initial_date = datetime.strptime(self.selected_date, "%Y-%m-%d").date()
         except ValueError:
@@ -271,6 +417,14 @@ class ReminderScreen(BoxLayout):
         except ValueError:
             return None
 
+    def validate_repeat(self, text):
+        # Returns the stored rule text, None for a one-off reminder, or False
+        try:
+            recurrence = Recurrence.from_text(text)
+        except ValueError:
+            return False
+        return str(recurrence) if recurrence else None
+
     def add_medicine(self):
         name = self.medicine_name.strip()
         date = self.selected_date.strip()
@@ -280,24 +434,29 @@ class ReminderScreen(BoxLayout):
             self.show_popup("Error", "Please fill out all fields and use HH:MM AM/PM format.")
             return
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("INSERT INTO medicines (name, date, time) VALUES (?, ?, ?)", (name, date, time_12))
-            conn.commit()
-            self.show_popup("Success", "Medicine added successfully!")
+        rule = self.validate_repeat(self.repeat_input)
+        if rule is False:
+            self.show_popup("Error", "Invalid repeat rule. Try e.g. 'daily', 'every 8 hours' or 'mon, wed, fri'.")
+            return
 
-            self.medicine_name = ''
-            self.time_input = ''
-            self.selected_date = ''
-            self.selected_reminder_id = 0
-            self.unselect_row()
+        def work():
+            row_id, due_at = store.add_medicine(name, date, time_12, rule)
+            return row_id, due_at, self.pager.track(row_id, due_at, rule)
 
-            self.refresh_reminder_view()
-        except Exception as e:
+        def done(result):
+            self.busy = False
+            row_id, due_at, in_window = result
+            self.schedule_reminder(row_id, due_at, name, rule)
+            self.show_written_row((row_id, name, date, time_12, due_at, rule), in_window)
+            self.show_popup("Success", "Medicine added successfully!")
+            self.clear_form()
+
+        def failed(e):
+            self.busy = False
             self.show_popup("Database Error", f"Could not add medicine: {e}")
-        finally:
-            conn.close()
+
+        self.busy = True
+        run_io(work, done, failed)
 
     def update_medicine(self):
         if self.selected_reminder_id == 0:
@@ -313,24 +472,29 @@ class ReminderScreen(BoxLayout):
             self.show_popup("Error", "Please fill out all fields and use HH:MM AM/PM format.")
             return
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("UPDATE medicines SET name = ?, date = ?, time = ? WHERE id = ?", (name, date, time_12, id))
-            conn.commit()
-            self.show_popup("Success", "Medicine updated successfully!")
+        rule = self.validate_repeat(self.repeat_input)
+        if rule is False:
+            self.show_popup("Error", "Invalid repeat rule. Try e.g. 'daily', 'every 8 hours' or 'mon, wed, fri'.")
+            return
 
-            self.medicine_name = ''
-            self.time_input = ''
-            self.selected_date = ''
-            self.selected_reminder_id = 0
-            self.unselect_row()
+        def work():
+            due_at = store.update_medicine(id, name, date, time_12, rule)
+            return due_at, self.pager.track(id, due_at, rule)
 
-            self.refresh_reminder_view()
-        except Exception as e:
+        def done(result):
+            self.busy = False
+            due_at, in_window = result
+            self.schedule_reminder(id, due_at, name, rule)
+            self.show_written_row((id, name, date, time_12, due_at, rule), in_window)
+            self.show_popup("Success", "Medicine updated successfully!")
+            self.clear_form()
+
+        def failed(e):
+            self.busy = False
             self.show_popup("Database Error", f"Could not update medicine: {e}")
-        finally:
-            conn.close()
+
+        self.busy = True
+        run_io(work, done, failed)
 
     def delete_medicine(self):
         if self.selected_reminder_id == 0:
@@ -339,6 +503,9 @@ class ReminderScreen(BoxLayout):
 
         id = self.selected_reminder_id
 
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.dialog import MDDialog
+
         dialog = MDDialog(
             title="Confirm Deletion",
             text=f"Are you sure you want to delete reminder ID {id}?",
@@ -352,137 +519,420 @@ class ReminderScreen(BoxLayout):
 
     def _execute_delete(self, id, dialog):
         dialog.dismiss()
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("DELETE FROM medicines WHERE id = ?", (id,))
-            conn.commit()
-            self.show_popup("Success", "Medicine deleted successfully!")
 
-            self.medicine_name = ''
-            self.time_input = ''
-            self.selected_date = ''
-            self.selected_reminder_id = 0
-            self.unselect_row()
+        def work():
+            store.delete_medicine(id)
+            self.snoozer.cancel(id)
+            self.pager.forget(id)
 
-            self.refresh_reminder_view()
-        except Exception as e:
-            self.show_popup("Database Error", f"Could not delete medicine: {e}")
-        finally:
-            conn.close()
+        def done(result):
+            self.busy = False
+            self.scheduler.cancel(id)
+            self.list_model.remove(id)
+            self.show_popup("Success", "Medicine deleted successfully!")
+            self.clear_form()
 
-    def refresh_reminder_view(self):
+        def failed(e):
+            self.busy = False
+            self.show_popup("Database Error", f"Could not delete medicine: {e}")
 
-        list_container = self.ids.reminder_list 
+        self.busy = True
+        run_io(work, done, failed)
 
-        rows_to_remove = [child for child in list_container.children if isinstance(child, ReminderRow)]
-        for row in rows_to_remove:
-            list_container.remove_widget(row)
+    def clear_form(self):
+        self.medicine_name = ''
+        self.time_input = ''
+        self.repeat_input = ''
+        self.selected_date = ''
+        self.selected_reminder_id = 0
+        self.unselect_row()
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM medicines ORDER BY date, time")
-        rows = cursor.fetchall()
-        conn.close()
+    def refresh_reminder_view(self):
+        # Only the newest refresh reaches the list: one still queued is
+        # cancelled, one already running is ignored when it comes back
+        if self._refresh is not None:
+            self._refresh.cancel()
+        self._list_version += 1
+        version = self._list_version
+        text = self.search_text
+
+        def work():
+            now = time.time()
+            if text:
+                with timer("list.search") as t:
+                    rows = db.search_medicines(text, self.SEARCH_LIMIT)
+                    t.rows = len(rows)
+            else:
+                with timer("list.refresh") as t:
+                    rows = self.pager.first_page(now)
+                    t.rows = len(rows)
+            return [list_row(row, now) for row in rows]
+
+        def done(rows):
+            if version != self._list_version:
+                return
+            self._refresh = None
+            with timer("list.render") as t:
+                t.rows = len(rows)
+                self.list_model.load(rows)
+            self.sync_selection()
+            if not text:
+                self.search_status = ''
+            elif len(rows) >= self.SEARCH_LIMIT:
+                self.search_status = f"First {self.SEARCH_LIMIT} matches"
+            else:
+                self.search_status = f"{len(rows)} match{'' if len(rows) == 1 else 'es'}"
+
+        def failed(e):
+            if version == self._list_version:
+                self._refresh = None
+            print(f"Error loading reminders: {e}")
+
+        self._refresh = run_io(work, done, failed)
+
+    def show_written_row(self, row, in_window):
+        # Rows written outside the loaded window come in with their page
+        if self.search_text or in_window:
+            self.list_model.upsert(*list_row(row, time.time()))
+        else:
+            self.list_model.remove(row[0])
+            self.sync_selection()
+
+    def sync_selection(self):
+        # The list model drops the selection with its row (search, page trim,
+        # reload); forget it here too so the actions don't act on a stale id
+        if self.list_model.selected_id is None:
+            self.selected_reminder_id = 0
 
-        for i, row in enumerate(rows):
-            row_id, name, date, time = row
+    def on_list_scroll(self, rv, scroll_y):
+        # scroll_y runs from 1 (top) to 0 (bottom); fetch a page at either end
+        if self.search_text or self._page_pending or self._refresh is not None or not len(self.list_model):
+            return
+        if scroll_y <= 0 and self.pager.has_later:
+            self.load_page(older=False)
+        elif scroll_y >= 1 and self.pager.has_older:
+            self.load_page(older=True)
+
+    def load_page(self, older):
+        version = self._list_version
+
+        def work():
+            with timer("list.page") as t:
+                rows, dropped = self.pager.older_page() if older else self.pager.later_page()
+                t.rows = len(rows)
+            now = time.time()
+            return [list_row(row, now) for row in rows], dropped
+
+        def done(result):
+            self._page_pending = False
+            if version != self._list_version:
+                return  # the list was reloaded meanwhile
+            rows, dropped = result
+            before = len(self.list_model)
+            for row_id in dropped:
+                self.list_model.remove(row_id)
+            for row in rows:
+                self.list_model.upsert(*row)
+            self.sync_selection()
+            if rows:
+                # Keep the rows that were on screen in place instead of
+                # jumping to the new end of the list
+                rv = self.ids.reminder_list
+                kept = max(before - len(dropped), 1)
+                share = kept / len(self.list_model)
+                Clock.schedule_once(lambda dt: setattr(rv, 'scroll_y', share if older else 1 - share), 0)
+
+        def failed(e):
+            self._page_pending = False
+            print(f"Error loading page: {e}")
+
+        self._page_pending = True
+        run_io(work, done, failed)
+
+    def on_search_text(self, text):
+        # Debounced: every keystroke pushes the search back by SEARCH_DELAY
+        self.search_text = text.strip()
+        self._search_event.cancel()
+        if db_ready.is_set():  # otherwise the post-setup refresh picks it up
+            self._search_event()
+
+    def sync_changes(self):
+        # Applies commits from other app instances or the importer; a no-op
+        # (one PRAGMA on the I/O worker) while nothing changed
+        if self.watcher is None or self._sync_pending:
+            return
 
-            if i % 2 == 0:
-                bg_color = [0.95, 0.95, 0.95, 1]
+        def work():
+            changes = self.watcher.poll()
+            if changes is None:
+                return None
+            rows, deleted = changes
+            if rows is None:
+                old_ids = set(store.rows)
+                store.load()
+                return None, old_ids - set(store.rows), self.load_upcoming_reminders()
+            store.apply(rows, deleted)
+            for row_id in deleted:
+                self.pager.forget(row_id)
+            return [(tuple(row), self.pager.track(row[0], row[4], row[5])) for row in rows], deleted, None
+
+        def done(changes):
+            self._sync_pending = False
+            if changes is None:
+                return
+            rows, deleted, entries = changes
+            for row_id in deleted:
+                self.scheduler.cancel(row_id)
+                self.list_model.remove(row_id)
+            self.sync_selection()
+            if rows is None:
+                for entry in entries:
+                    self.scheduler.schedule(*entry)
+                self.refresh_reminder_view()
+                return
+            for row, in_window in rows:
+                row_id, name, date, time_12, due_at, rule = row
+                self.schedule_reminder(row_id, due_at, name, rule)
+                self.show_written_row(row, in_window)
+            if self.search_text:
+                self.refresh_reminder_view()
+
+        def failed(e):
+            self._sync_pending = False
+            print(f"Error checking for changes: {e}")
+
+        self._sync_pending = True
+        run_io(work, done, failed)
+
+    def mark_dose(self, event):
+        if self.selected_reminder_id == 0:
+            self.show_popup("Error", "Please select a medicine from the list first.")
+            return
+        item = self.list_model.get(self.selected_reminder_id)
+        if item is None:
+            self.selected_reminder_id = 0
+            self.show_popup("Error", "Please select a medicine from the list first.")
+            return
+        # The dose just notified, or else the one the list shows
+        due_at = self.dose_log.last_notified(item['item_id']) or item['due_at']
+        self.answer_dose(item['item_id'], item['item_name'], due_at, event)
+
+    def answer_dose(self, row_id, name, due_at, event):
+        # Taken/skipped acknowledge the dose and drop any pending snooze;
+        # snoozed brings it back in SNOOZE_MINUTES
+        def work():
+            if event == 'snoozed':
+                self.snoozer.snooze(row_id, name, due_at)
             else:
-                bg_color = [1, 1, 1, 1]
+                self.snoozer.acknowledge(row_id, name, due_at, event)
+
+        def done(result):
+            popup = self.due_prompts.get(row_id)
+            if popup is not None:
+                popup.dismiss()
+            if event == 'snoozed':
+                self.show_popup("Success", f"{name} snoozed for {SNOOZE_MINUTES} minutes.")
+            else:
+                self.show_popup("Success", f"{name} marked as {event}.")
 
-            new_row = ReminderRow(
-                item_id=row_id,
-                item_name=name,
-                item_date=date,
-                item_time=time,
-                row_color=bg_color
-            )
+        run_io(work, done, lambda e: self.show_popup("Database Error", f"Could not record the dose: {e}"))
 
-            list_container.add_widget(new_row)
+    def show_due_prompt(self, row_id, name, due_at):
+        # plyer notifications can't carry buttons, so a fired dose also opens
+        # a popup to answer it from (one per reminder)
+        from kivy.uix.button import Button
 
-        list_container.height = list_container.minimum_height
+        if row_id in self.due_prompts:
+            return
+        content = BoxLayout(orientation='vertical', spacing=10)
+        content.add_widget(Label(text=f"Time to take your medicine: {name}"))
+        buttons = BoxLayout(spacing=10, size_hint_y=None, height=44)
+        content.add_widget(buttons)
+        popup = Popup(title="Medicine Due", content=content, size_hint=(0.9, 0.35))
+        popup.bind(on_dismiss=lambda instance: self.due_prompts.pop(row_id, None))
+        self.due_prompts[row_id] = popup
+
+        for text, event in (('Taken', 'taken'), (f'Snooze {SNOOZE_MINUTES} min', 'snoozed'), ('Skip', 'skipped')):
+            def on_answer(button, event=event):
+                popup.dismiss()
+                self.answer_dose(row_id, name, due_at, event)
+
+            buttons.add_widget(Button(text=text, on_release=on_answer))
+        popup.open()
 
-    def select_row(self, row_widget):
-        self.unselect_row()
+    def show_adherence(self):
+        def done(text):
+            label = Label(text=text, font_name='RobotoMono-Regular', font_size='12sp', halign='left', valign='top')
+            label.bind(size=lambda instance, size: setattr(instance, 'text_size', size))
+            Popup(title="Adherence (last 30 days)", content=label, size_hint=(0.95, 0.8)).open()
+
+        run_io(lambda: format_adherence(adherence(db, *recent_days(30))), done,
+               lambda e: self.show_popup("Database Error", f"Could not load adherence: {e}"))
+
+    def show_export(self):
+        from kivy.uix.button import Button
+        from kivy.uix.textinput import TextInput
+
+        content = BoxLayout(orientation='vertical', spacing=10)
+        path_input = TextInput(text=os.path.join(os.path.expanduser('~'), 'medicine_reminders.csv'),
+                               multiline=False, size_hint_y=None, height=44)
+        content.add_widget(Label(text='Export to (.csv, .jsonl or .ics):'))
+        content.add_widget(path_input)
+        export_button = Button(text='Export', size_hint_y=None, height=44)
+        content.add_widget(export_button)
+        popup = Popup(title="Export Reminders", content=content, size_hint=(0.9, 0.4))
+
+        def on_export(button):
+            path = path_input.text.strip()
+            popup.dismiss()
+
+            # Streams on a worker thread; the result comes back on the UI thread
+            def run():
+                try:
+                    message = ("Success", f"Exported {export_file(db, path)} reminders to {path}.")
+                except Exception as e:
+                    message = ("Export Error", f"Export failed: {e}")
+                Clock.schedule_once(lambda dt: self.show_popup(*message), 0)
+
+            threading.Thread(target=run, daemon=True).start()
+
+        export_button.bind(on_release=on_export)
+        popup.open()
 
-        row_widget.row_color = [0.1, 0.5, 0.8, 0.5]
-        self.selected_row_widget = row_widget
+    def show_diagnostics(self):
+        from kivy.uix.button import Button
 
-        self.selected_reminder_id = row_widget.item_id
-        self.medicine_name = row_widget.item_name
-        self.selected_date = row_widget.item_date
-        self.time_input = row_widget.item_time
+        content = BoxLayout(orientation='vertical', spacing=10)
+        label = Label(text=stats.format(), font_name='RobotoMono-Regular', font_size='12sp',
+                      halign='left', valign='top')
+        label.bind(size=lambda instance, size: setattr(instance, 'text_size', size))
+        toggle = Button(text='Disable Stats' if stats.enabled else 'Enable Stats', size_hint_y=None, height=44)
 
-    def unselect_row(self):
-        if self.selected_row_widget:
+        def on_toggle(button):
+            stats.toggle()
+            button.text = 'Disable Stats' if stats.enabled else 'Enable Stats'
 
-            list_container = self.ids.reminder_list
-            rows = [child for child in list_container.children if isinstance(child, ReminderRow)]
+        toggle.bind(on_release=on_toggle)
+        content.add_widget(label)
+        content.add_widget(toggle)
 
-            try:
-                display_list = rows[::-1]
-                idx = display_list.index(self.selected_row_widget)
+        popup = Popup(title="Diagnostics", content=content, size_hint=(0.95, 0.8))
+        update = Clock.schedule_interval(lambda dt: setattr(label, 'text', stats.format()), 1)
+        popup.bind(on_dismiss=lambda instance: update.cancel())
+        popup.open()
 
-                if idx % 2 == 0:
-                    self.selected_row_widget.row_color = [0.95, 0.95, 0.95, 1]
-                else:
-                    self.selected_row_widget.row_color = [1, 1, 1, 1]
+    def select_row(self, row_id):
+        item = self.list_model.select(row_id)
+        if item is None:
+            return
 
-            except ValueError:
-                self.selected_row_widget.row_color = [1, 1, 1, 1]
+        self.selected_reminder_id = item['item_id']
+        self.medicine_name = item['item_name']
+        # A recurring reminder is listed by its next dose; the form edits the
+        # stored start, so Update does not move the rule's anchor
+        self.selected_date = item['start_date']
+        self.time_input = item['start_time']
+        self.repeat_input = item['item_repeat']
 
-            self.selected_row_widget = None
+    def unselect_row(self):
+        self.list_model.select(None)
 
-    # ----------------- REMINDER THREAD (Adapted) -----------------
+    # ----------------- REMINDER SCHEDULER -----------------
 
     def start_reminder_checker(self):
 
-        reminder_thread = threading.Thread(target=self.check_reminders_loop, daemon=True)
-        reminder_thread.start()
-
-    def check_reminders_loop(self):
-        while True:
-            time.sleep(60)
-            current_time = datetime.now().strftime("%Y-%m-%d %I:%M %p")
-
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM medicines WHERE date || ' ' || time = ?", (current_time,))
-            reminders = cursor.fetchall()
-            conn.close()
-
-            if reminders:
-                for reminder in reminders:
-                    medicine_name = reminder[0]
-                    self.send_notification(medicine_name)
-
-    def send_notification(self, medicine_name):
+        self.dispatcher = NotificationDispatcher([PlyerBackend(), ConsoleBackend()], title="Medicine Reminder 💊")
+        self.dispatcher.start()
+        # Fired reminders survive a crash or sleep until delivered; started
+        # once the database is ready (see on_database_ready)
+        self.outbox = NotificationOutbox(db, self.dispatcher, on_missed=self.on_reminder_due)
+        # Dose events (notified/taken/skipped) are written in batches
+        self.dose_log = DoseLog(db).start()
+        # Other app instances on the same database schedule the same doses;
+        # only the one that claims a dose sends it
+        self.claims = OccurrenceClaims()
+        self.scheduler = ReminderScheduler(on_due=self.on_reminder_due, load=self.load_upcoming_reminders)
+        # Snooze/acknowledge; pending snoozes are part of the scheduler's first load
+        self.snoozer = Snoozer(db, self.scheduler, self.dose_log)
+        self.scheduler.start()
+
+    def load_upcoming_reminders(self):
+        db_ready.wait()
+        since = int(time.time()) - self.scheduler.grace
+        return list(scheduler_entries(store.upcoming_reminders(since), since)) + self.snoozer.entries()
+
+    def schedule_reminder(self, row_id, due_at, name, rule):
+        self.scheduler.cancel(row_id)
+        for entry in scheduler_entries([(row_id, due_at, name, rule)], int(time.time()) - self.scheduler.grace):
+            self.scheduler.schedule(*entry)
+
+    def on_reminder_due(self, key, payload, due_at):
+        row_id, snoozed = split_key(key)
+        medicine_name, dose_due_at, announce_at = payload, due_at, due_at
+        if snoozed:
+            # Announced under the snooze time; answered for the dose it snoozed
+            medicine_name, dose_due_at, announce_at = payload
+            self.snoozer.fired(row_id, announce_at)
+            if db.query_one("SELECT 1 FROM medicines WHERE id = ?", (row_id,)) is None:
+                return  # deleted since it was snoozed
+
+        def fire():
+            self.outbox.send(row_id, medicine_name, announce_at)
+            if not snoozed:  # a snoozed dose was counted when it first went out
+                self.dose_log.record(row_id, medicine_name, dose_due_at, "notified")
+
+        fired = False
         try:
-            notification.notify(
-                title="Medicine Reminder 💊",
-                message=f"Time to take your medicine: {medicine_name}",
-                timeout=10
-            )
-        except Exception as e:
-            print(f"Error sending notification via plyer: {e}. (Ensure plyer dependencies are installed for target OS)")
-            print(f"REMINDER: {medicine_name} is due now!")
+            fired = self.claims.fire_once(db, row_id, int(announce_at), fire)
+        finally:
+            # Also prompt for a dose announced elsewhere (another window, or
+            # this app before a restart) as long as nobody has answered it yet
+            if fired or not self.dose_log.answered(row_id, dose_due_at):
+                Clock.schedule_once(lambda dt: self.show_due_prompt(row_id, medicine_name, dose_due_at), 0)
 
 
 # ----------------- KIVY APPLICATION -----------------
 
 class MedicineReminderApp(MDApp):
     def build(self):
+        self.startup_marks = {"imports_ms": round((time.perf_counter() - STARTUP_T0) * 1000, 1)}
         self.theme_cls.primary_palette = "Blue"
         self.theme_cls.theme_style = "Light"
 
+        Builder.load_string(KV)
+
         from kivy.uix.scrollview import ScrollView
         main_scroll = ScrollView(do_scroll_x=False, do_scroll_y=True)
-        main_scroll.add_widget(ReminderScreen())
+        self.screen = ReminderScreen()
+        main_scroll.add_widget(self.screen)
+        self.startup_marks["build_ms"] = round((time.perf_counter() - STARTUP_T0) * 1000, 1)
         return main_scroll
 
+    def on_stop(self):
+        io_executor.shutdown(wait=True)  # let queued writes finish
+        self.screen.outbox.stop()
+        self.screen.claims.stop()
+        self.screen.dose_log.stop()  # write out events still queued
+
+    def on_start(self):
+        from kivy.core.window import Window
+        Window.bind(on_flip=self.on_first_frame)
+
+    def on_first_frame(self, window):
+        window.unbind(on_flip=self.on_first_frame)
+        if not STARTUP_TIME_MODE:
+            return
+
+        report = dict(self.startup_marks, first_frame_ms=round((time.perf_counter() - STARTUP_T0) * 1000, 1),
+                      timestamp=int(time.time()))
+        line = json.dumps(report)
+        if STARTUP_TIME_MODE == "1":
+            print(f"STARTUP {line}")
+        else:
+            with open(STARTUP_TIME_MODE, "a") as f:
+                f.write(line + "\n")
+        self.stop()
+
 
 if __name__ == '__main__':
     MedicineReminderApp().run()
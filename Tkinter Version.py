@@ -1,32 +1,29 @@
 import tkinter as tk
+from tkinter import filedialog
 from tkinter import messagebox
 from tkinter import ttk
 from tkcalendar import Calendar
-import sqlite3
-import time
+import queue
 import threading
+import time
 from datetime import datetime
-from plyer import notification  # For cross-platform notifications
+from archive import Archiver
+from claims import OccurrenceClaims
+from database import ChangeWatcher, Database
+from doselog import DoseLog, adherence, format_adherence, recent_days
+from exporter import export_file
+from list_model import ReminderListModel, ReminderPager
+from recurrence import Recurrence, list_row, scheduler_entries
+from notifier import ConsoleBackend, NotificationDispatcher, PlyerBackend  # plyer for cross-platform notifications
+from outbox import NotificationOutbox
+from scheduler import ReminderScheduler
+from snooze import SNOOZE_MINUTES, Snoozer, payload_name, split_key
+from store import ReminderStore
+from stats import stats, timer
 # Optional: For Windows, you can use win10toast if plyer doesn't work
 # from win10toast import ToastNotifier
 
 
-# Database Setup
-def setup_database():
-    conn = sqlite3.connect("medicine_reminder.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS medicines (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        date TEXT NOT NULL,
-        time TEXT NOT NULL
-    )
-    """)
-    conn.commit()
-    conn.close()
-
-
 # Add Medicine to Database
 def add_medicine():
     name = name_entry.get()
@@ -41,16 +38,18 @@ def add_medicine():
         messagebox.showerror("Error", "Invalid time format. Please use HH:MM AM/PM format.")
         return
 
+    rule = read_repeat_rule()
+    if rule is False:
+        return
+
     if name and date and time_12:
-        conn = sqlite3.connect("medicine_reminder.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO medicines (name, date, time) VALUES (?, ?, ?)", (name, date, time_12))
-        conn.commit()
-        conn.close()
+        id, due_at = store.add_medicine(name, date, time_12, rule)
+        schedule_reminder(id, due_at, name, rule)
+        show_written_row(id, name, date, time_12, due_at, rule)
         messagebox.showinfo("Success", "Medicine added successfully!")
         name_entry.delete(0, tk.END)
         time_entry.delete(0, tk.END)
-        refresh_calendar_view()
+        repeat_entry.delete(0, tk.END)
     else:
         messagebox.showerror("Error", "Please fill out all fields.")
 
@@ -73,20 +72,33 @@ def update_medicine():
             messagebox.showerror("Error", "Invalid time format. Please use HH:MM AM/PM format.")
             return
 
+        rule = read_repeat_rule()
+        if rule is False:
+            return
+
         if name and date and time_12:
-            conn = sqlite3.connect("medicine_reminder.db")
-            cursor = conn.cursor()
-            cursor.execute("UPDATE medicines SET name = ?, date = ?, time = ? WHERE id = ?", (name, date, time_12, id))
-            conn.commit()
-            conn.close()
+            due_at = store.update_medicine(id, name, date, time_12, rule)
+            schedule_reminder(id, due_at, name, rule)
+            show_written_row(id, name, date, time_12, due_at, rule)
             messagebox.showinfo("Success", "Medicine updated successfully!")
-            refresh_calendar_view()
         else:
             messagebox.showerror("Error", "Please fill out all fields.")
     else:
         messagebox.showerror("Error", "Please select a medicine to update.")
 
 
+# Read the Repeat field; returns the stored rule text, None for one-off, or
+# False after showing an error
+def read_repeat_rule():
+    try:
+        recurrence = Recurrence.from_text(repeat_entry.get())
+    except ValueError:
+        messagebox.showerror("Error", "Invalid repeat rule. Try e.g. 'daily', 'every 8 hours', "
+                                      "'mon, wed, fri' or 'daily until 2025-12-31'.")
+        return False
+    return str(recurrence) if recurrence else None
+
+
 # Delete Medicine from Database
 def delete_medicine():
     selected_item = tree.focus()
@@ -94,75 +106,426 @@ def delete_medicine():
         item = tree.item(selected_item)
         id = item['values'][0]
 
-        conn = sqlite3.connect("medicine_reminder.db")
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM medicines WHERE id = ?", (id,))
-        conn.commit()
-        conn.close()
+        store.delete_medicine(id)
+        scheduler.cancel(id)
+        snoozer.cancel(id)
+        pager.forget(id)
+        hide_row(id)
         messagebox.showinfo("Success", "Medicine deleted successfully!")
-        refresh_calendar_view()
     else:
         messagebox.showerror("Error", "Please select a medicine to delete.")
 
 
+# Record that the selected reminder's dose was taken, skipped or snoozed
+def mark_dose(event):
+    selected_item = tree.focus()
+    if not selected_item:
+        messagebox.showerror("Error", "Please select a medicine first.")
+        return
+    id = int(selected_item)
+    item = tree_rows.get(id)
+    if item is None:  # focus can outlive its row (search, page trim)
+        messagebox.showerror("Error", "Please select a medicine first.")
+        return
+    # The dose just notified, or else the one the list shows
+    due_at = dose_log.last_notified(id) or item['due_at']
+    answer_dose(id, item['item_name'], due_at, event)
+    if event == "snoozed":
+        messagebox.showinfo("Success", f"{item['item_name']} snoozed for {SNOOZE_MINUTES} minutes.")
+    else:
+        messagebox.showinfo("Success", f"{item['item_name']} marked as {event}.")
+
+
+# Taken/skipped acknowledge a dose and drop any pending snooze; snoozed
+# brings it back in SNOOZE_MINUTES
+def answer_dose(id, name, due_at, event):
+    if event == "snoozed":
+        snoozer.snooze(id, name, due_at)
+    else:
+        snoozer.acknowledge(id, name, due_at, event)
+    clear_due(id)
+    close_due_prompt(id)
+
+
+# Adherence Summary (last 30 days, read from the rollup tables)
+def show_adherence():
+    window = tk.Toplevel(root)
+    window.title("Adherence (last 30 days)")
+    text = tk.Text(window, width=66, height=20, font=("Courier", 10))
+    text.pack(padx=10, pady=10)
+    text.insert(tk.END, format_adherence(adherence(db, *recent_days(30))))
+    text.config(state=tk.DISABLED)
+
+
+# Export (File menu)
+# Runs on a worker thread; the result comes back through the UI event queue.
+def export_reminders():
+    path = filedialog.asksaveasfilename(
+        title="Export Reminders", defaultextension=".csv",
+        filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("iCalendar", "*.ics")])
+    if not path:
+        return
+
+    def run():
+        try:
+            ui_events.put(("message", "Success", f"Exported {export_file(db, path)} reminders to {path}."))
+        except Exception as e:
+            ui_events.put(("message", "Error", f"Export failed: {e}"))
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# Treeview Sync
+# The Treeview mirrors tree_rows: item iids are the row ids and item
+# positions follow tree_rows' (due_at, id) order, so a write only touches
+# the affected item.  Only a window of rows is loaded (see ReminderPager);
+# further pages come in as the list is scrolled to either end.
+tree_rows = ReminderListModel()
+pager = None  # created with the database below
+page_pending = False
+
+
+def show_row(id, name, date, time_12, due_at, repeat="", start_date=None, start_time=None):
+    index = tree_rows.upsert(id, name, date, time_12, due_at, repeat, start_date, start_time)
+    iid = str(id)
+    if tree.exists(iid):
+        tree.item(iid, values=(id, name, date, time_12, repeat))
+        tree.move(iid, "", index)
+    else:
+        tree.insert("", index, iid=iid, values=(id, name, date, time_12, repeat), tags=row_tags(id))
+
+
+def hide_row(id):
+    if tree_rows.remove(id) is not None:
+        tree.delete(str(id))
+
+
+# Show a row written from this window, if it falls inside the loaded window
+def show_written_row(id, name, date, time_12, due_at, rule):
+    if search_entry.get().strip() or pager.track(id, due_at, rule):
+        show_row(*list_row((id, name, date, time_12, due_at, rule), time.time()))
+    else:
+        hide_row(id)
+
+
+def fill_tree(rows):
+    now = time.time()
+    tree_rows.load(list_row(row, now) for row in rows)
+    tree.delete(*tree.get_children())
+    for item in tree_rows.data:
+        tree.insert("", tk.END, iid=str(item['item_id']), tags=row_tags(item['item_id']), values=(
+            item['item_id'], item['item_name'], item['item_date'], item['item_time'], item['item_repeat']))
+
+
 # Refresh Calendar View
 def refresh_calendar_view():
-    for row in tree.get_children():
-        tree.delete(row)
+    if search_entry.get().strip():
+        apply_search()
+        return
+    with timer("list.refresh") as t:
+        rows = pager.first_page()
+        t.rows = len(rows)
+        fill_tree(rows)
 
-    conn = sqlite3.connect("medicine_reminder.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM medicines")
-    rows = cursor.fetchall()
-    conn.close()
 
-    for row in rows:
-        tree.insert("", tk.END, values=row)
+def load_page(older):
+    global page_pending
+    page_pending = False
+    if search_entry.get().strip():
+        return
+    with timer("list.page") as t:
+        rows, dropped = pager.older_page() if older else pager.later_page()
+        t.rows = len(rows)
+        anchor = tree.get_children()[:1]
+        for id in dropped:
+            hide_row(id)
+        now = time.time()
+        for row in rows:
+            show_row(*list_row(row, now))
+    if older and anchor and rows:
+        tree.see(anchor[0])  # keep the rows the user was looking at in view
+
+
+# Load the next page when the user scrolls past either end of the list
+def on_tree_scroll(event):
+    up = event.num == 4 or getattr(event, "delta", 0) > 0
+    first, last = tree.yview()
+    if up and first <= 0 and pager.has_older:
+        load_page(older=True)
+    elif not up and last >= 1 and pager.has_later:
+        load_page(older=False)
+
+
+def on_scrollbar_moved(first, last):
+    global page_pending
+    tree_scrollbar.set(first, last)
+    if float(last) >= 1 and pager.has_later and tree_rows and not page_pending:
+        page_pending = True
+        root.after_idle(load_page, False)
+
+
+# Search
+# Typing restarts a short timer; the FTS query runs once the user pauses and
+# the Treeview is rebuilt with just the matching rows.
+SEARCH_DELAY_MS = 250
+SEARCH_LIMIT = 500
+search_after_id = None
+
+
+def on_search_key(event=None):
+    global search_after_id
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DELAY_MS, apply_search)
+
+
+def apply_search():
+    global search_after_id
+    search_after_id = None
+    text = search_entry.get().strip()
+    if not text:
+        search_status.config(text="")
+        refresh_calendar_view()
+        return
 
+    with timer("list.search") as t:
+        rows = db.search_medicines(text, SEARCH_LIMIT)
+        t.rows = len(rows)
+        fill_tree(rows)
+    if len(rows) >= SEARCH_LIMIT:
+        search_status.config(text=f"Showing the first {SEARCH_LIMIT} matches")
+    else:
+        search_status.config(text=f"{len(rows)} match{'' if len(rows) == 1 else 'es'}")
+
+
+# Change Detection
+# Another app instance or the importer may write to the same database.  A
+# cheap PRAGMA check runs every second; only after a commit are the changed
+# rows fetched and applied to the store, the scheduler and the Treeview.
+CHANGE_POLL_MS = 1000
+
+
+def sync_changes():
+    changes = watcher.poll()
+    if changes is None:
+        return False
+    rows, deleted = changes
+    if rows is None:
+        # Too much changed (or the change log was pruned): reload everything
+        old_ids = set(store.rows)
+        store.load()
+        for id in old_ids - set(store.rows):
+            scheduler.cancel(id)
+        for entry in load_upcoming_reminders():
+            scheduler.schedule(*entry)
+        refresh_calendar_view()
+        return True
+
+    store.apply(rows, deleted)
+    for id in deleted:
+        scheduler.cancel(id)
+        pager.forget(id)
+        hide_row(id)
+    for id, name, date, time_12, due_at, rule in rows:
+        schedule_reminder(id, due_at, name, rule)
+        show_written_row(id, name, date, time_12, due_at, rule)
+    if search_entry.get().strip():
+        apply_search()
+    return True
+
+
+def poll_changes():
+    try:
+        sync_changes()
+    except Exception as e:
+        print(f"Error checking for changes: {e}")
+    root.after(CHANGE_POLL_MS, poll_changes)
 
-# Check Reminders
-def check_reminders():
-    while True:
-        current_time = datetime.now().strftime("%Y-%m-%d %I:%M %p")  # Current time in 12-hour format
-        print(f"Checking time: {current_time}")  # Debugging log
-
-        conn = sqlite3.connect("medicine_reminder.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM medicines WHERE date || ' ' || time = ?", (current_time,))
-        reminders = cursor.fetchall()
-        conn.close()
-
-        if reminders:
-            for reminder in reminders:
-                print(f"Reminder found: {reminder[0]}")  # Debugging log
-                send_notification(reminder[0])  # Call the function for sending notification
-        else:
-            print("No reminder found.")  # Debugging log
 
-        time.sleep(60)  # Check every 60 seconds
+# Diagnostics Panel
+def show_diagnostics():
+    window = tk.Toplevel(root)
+    window.title("Diagnostics")
+    text = tk.Text(window, width=80, height=20, font=("Courier", 10))
+    text.pack(padx=10, pady=10)
+
+    def toggle():
+        stats.toggle()
+        toggle_button.config(text="Disable Stats" if stats.enabled else "Enable Stats")
 
+    toggle_button = tk.Button(window, text="Disable Stats" if stats.enabled else "Enable Stats", command=toggle)
+    toggle_button.pack(side=tk.LEFT, padx=10, pady=(0, 10))
+    tk.Button(window, text="Reset", command=stats.reset).pack(side=tk.LEFT, pady=(0, 10))
 
-# Function for sending notifications
-def send_notification(medicine_name):
+    def update():
+        if not window.winfo_exists():
+            return
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, stats.format())
+        window.after(1000, update)
+
+    update()
+
+
+# Load Upcoming Reminders for the Scheduler
+def load_upcoming_reminders():
+    since = int(time.time()) - scheduler.grace
+    return list(scheduler_entries(store.upcoming_reminders(since), since)) + snoozer.entries()
+
+
+# (Re)schedule one reminder after it was added or updated
+def schedule_reminder(id, due_at, name, rule):
+    scheduler.cancel(id)
+    for entry in scheduler_entries([(id, due_at, name, rule)], int(time.time()) - scheduler.grace):
+        scheduler.schedule(*entry)
+
+
+# Reminder Due (called from the scheduler thread)
+# Other app instances on the same database schedule the same dose; only the
+# one that claims it sends the notification.
+def on_reminder_due(key, payload, due_at):
+    id, snoozed = split_key(key)
+    medicine_name, dose_due_at, announce_at = payload, due_at, due_at
+    if snoozed:
+        # Announced under the snooze time; answered for the dose it snoozed
+        medicine_name, dose_due_at, announce_at = payload
+        snoozer.fired(id, announce_at)
+        if db.query_one("SELECT 1 FROM medicines WHERE id = ?", (id,)) is None:
+            return  # deleted since it was snoozed
+
+    def fire():
+        # Recorded in the outbox first; delivered in the background, grouped per minute
+        outbox.send(id, medicine_name, announce_at)
+        if not snoozed:  # a snoozed dose was counted when it first went out
+            dose_log.record(id, medicine_name, dose_due_at, "notified")
+
+    fired = False
     try:
-        # Use plyer for cross-platform notification
-        notification.notify(
-            title="Medicine Reminder",
-            message=f"Time to take your medicine: {medicine_name}",
-            timeout=10
-        )
-        # Optional: Use win10toast for Windows (uncomment the below lines if you want to use it)
-        # toaster = ToastNotifier()
-        # toaster.show_toast("Medicine Reminder", f"Time to take your medicine: {medicine_name}", duration=10)
-    except Exception as e:
-        print(f"Error sending notification: {e}")
+        fired = claims.fire_once(db, id, int(announce_at), fire)
+    finally:
+        # Also prompt for a dose announced elsewhere (another window, or this
+        # app before a restart) as long as nobody has answered it yet
+        if fired or not dose_log.answered(id, dose_due_at):
+            ui_events.put(("due", id, medicine_name, dose_due_at))
+
+
+# Scheduler -> Tk Bridge
+# Worker threads never touch Tk.  They put events on ui_events and the
+# mainloop drains it every UI_DRAIN_MS:
+#   ("next", (due_at, id, name) or None)  earliest scheduled reminder changed
+#   ("due", id, name, due_at)             a reminder just fired
+#   ("message", title, text)              result of a background job
+# The countdown is worked out from the last "next" event, so keeping it
+# live costs no database or scheduler access.
+UI_DRAIN_MS = 250
+DUE_HIGHLIGHT_S = 30 * 60  # a fired reminder stays highlighted until marked, or this long
+ui_events = queue.Queue()
+next_dose = None
+due_rows = {}  # id -> time it fired
+
+
+def row_tags(id):
+    return ("due",) if id in due_rows else ()
+
+
+def clear_due(id):
+    if due_rows.pop(id, None) is not None and tree.exists(str(id)):
+        tree.item(str(id), tags=())
+
+
+def format_countdown(seconds):
+    if seconds < 60:
+        return f"{max(int(seconds), 0)}s"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m {int(seconds % 60):02d}s"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f"{hours}h {minutes:02d}m"
+    return f"{hours // 24}d {hours % 24}h"
+
+
+def drain_ui_events():
+    global next_dose
+    while True:
+        try:
+            event = ui_events.get_nowait()
+        except queue.Empty:
+            break
+        if event[0] == "next":
+            next_dose = event[1]
+        elif event[0] == "due":
+            id, name, due_at = event[1:]
+            due_rows[id] = time.time()
+            if tree.exists(str(id)):
+                tree.item(str(id), tags=("due",))
+                tree.see(str(id))
+            show_due_prompt(id, name, due_at)
+        elif event[0] == "message":
+            (messagebox.showerror if event[1] == "Error" else messagebox.showinfo)(event[1], event[2])
+
+    now = time.time()
+    for id in [id for id, fired in due_rows.items() if now - fired > DUE_HIGHLIGHT_S]:
+        clear_due(id)
+    if next_dose is None:
+        text = "No upcoming doses"
+    else:
+        due_at, key, payload = next_dose
+        name = payload_name(payload)
+        text = f"Next dose: {name} in {format_countdown(due_at - now)}"
+    if next_dose_label.cget("text") != text:
+        next_dose_label.config(text=text)
+    root.after(UI_DRAIN_MS, drain_ui_events)
+
+
+
+# Due Prompt
+# plyer notifications can't carry buttons, so a fired dose also opens a
+# small window to answer it from: one per reminder, raised if already open.
+due_prompts = {}  # id -> prompt window
+
+
+def show_due_prompt(id, name, due_at):
+    window = due_prompts.get(id)
+    if window is not None:
+        window.lift()
+        return
+    window = tk.Toplevel(root)
+    window.title("Medicine Due")
+    window.attributes("-topmost", True)
+    window.protocol("WM_DELETE_WINDOW", lambda: close_due_prompt(id))
+    due_prompts[id] = window
+
+    tk.Label(window, text=f"Time to take your medicine: {name}", padx=20, pady=10).pack()
+    buttons = tk.Frame(window)
+    buttons.pack(pady=(0, 10))
+    for text, event in (("Taken", "taken"), (f"Snooze {SNOOZE_MINUTES} min", "snoozed"), ("Skip", "skipped")):
+        tk.Button(buttons, text=text, command=lambda event=event: answer_dose(id, name, due_at, event)).pack(
+            side=tk.LEFT, padx=5)
+
+
+def close_due_prompt(id):
+    window = due_prompts.pop(id, None)
+    if window is not None:
+        window.destroy()
 
 
 # GUI Setup
-setup_database()
+db = Database()
+db.setup()
+# List pages and the scheduler read the in-memory store; writes go through it
+store = ReminderStore(db).load()
+pager = ReminderPager(store)
+watcher = ChangeWatcher(db)
 root = tk.Tk()
 root.title("Medicine Reminder App")
 
+menubar = tk.Menu(root)
+file_menu = tk.Menu(menubar, tearoff=0)
+file_menu.add_command(label="Export...", command=export_reminders)
+menubar.add_cascade(label="File", menu=file_menu)
+root.config(menu=menubar)
+
 frame = tk.Frame(root)
 frame.pack(padx=10, pady=10)
 
@@ -178,34 +541,98 @@ tk.Label(frame, text="Time (HH:MM AM/PM):").grid(row=2, column=0, sticky="w")
 time_entry = tk.Entry(frame)
 time_entry.grid(row=2, column=1)
 
+tk.Label(frame, text="Repeat (e.g. daily, every 8 hours):").grid(row=3, column=0, sticky="w")
+repeat_entry = tk.Entry(frame)
+repeat_entry.grid(row=3, column=1)
+
 add_button = tk.Button(frame, text="Add Medicine", command=add_medicine)
-add_button.grid(row=3, column=0, pady=10)
+add_button.grid(row=4, column=0, pady=10)
 
 update_button = tk.Button(frame, text="Update Medicine", command=update_medicine)
-update_button.grid(row=3, column=1, pady=10)
+update_button.grid(row=4, column=1, pady=10)
 
 delete_button = tk.Button(frame, text="Delete Medicine", command=delete_medicine)
-delete_button.grid(row=4, column=0, pady=10)
+delete_button.grid(row=5, column=0, pady=10)
 
-calendar_button = tk.Button(frame, text="Show Calendar", command=refresh_calendar_view)
-calendar_button.grid(row=4, column=1, pady=10)
+calendar_button = tk.Button(frame, text="Show Calendar", command=sync_changes)
+calendar_button.grid(row=5, column=1, pady=10)
+
+taken_button = tk.Button(frame, text="Mark Taken", command=lambda: mark_dose("taken"))
+taken_button.grid(row=6, column=0, pady=(0, 10))
+
+skipped_button = tk.Button(frame, text="Skip Dose", command=lambda: mark_dose("skipped"))
+skipped_button.grid(row=6, column=1, pady=(0, 10))
+
+adherence_button = tk.Button(frame, text="Adherence", command=show_adherence)
+adherence_button.grid(row=7, column=0, pady=(0, 10))
+
+diagnostics_button = tk.Button(frame, text="Diagnostics", command=show_diagnostics)
+diagnostics_button.grid(row=7, column=1, pady=(0, 10))
+
+snooze_button = tk.Button(frame, text=f"Snooze {SNOOZE_MINUTES} min", command=lambda: mark_dose("snoozed"))
+snooze_button.grid(row=8, column=0, pady=(0, 10))
+
+next_dose_label = tk.Label(root, text="", font=("TkDefaultFont", 11, "bold"))
+next_dose_label.pack(padx=10)
+
+# Search Box
+search_frame = tk.Frame(root)
+search_frame.pack(padx=10, fill=tk.X)
+
+tk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+search_entry = tk.Entry(search_frame)
+search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+search_entry.bind("<KeyRelease>", on_search_key)
+search_status = tk.Label(search_frame, text="")
+search_status.pack(side=tk.LEFT)
 
 # Calendar View
 tree_frame = tk.Frame(root)
 tree_frame.pack(padx=10, pady=10)
 
-tree = ttk.Treeview(tree_frame, columns=("ID", "Name", "Date", "Time"), show="headings")
+tree = ttk.Treeview(tree_frame, columns=("ID", "Name", "Date", "Time", "Repeat"), show="headings")
 tree.heading("ID", text="ID")
 tree.heading("Name", text="Medicine Name")
 tree.heading("Date", text="Date")
 tree.heading("Time", text="Time")
+tree.heading("Repeat", text="Repeat")
 tree.column("ID", width=30)
+tree.tag_configure("due", background="#ffe08a")
+tree_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+tree.configure(yscrollcommand=on_scrollbar_moved)
+tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 tree.pack(fill=tk.BOTH, expand=True)
+for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+    tree.bind(sequence, on_tree_scroll, add="+")
 
 refresh_calendar_view()
 
-# Start Reminder Checker in a Separate Thread
-reminder_thread = threading.Thread(target=check_reminders, daemon=True)
-reminder_thread.start()
-
+# Dose events (notified/taken/skipped) are written in batches
+dose_log = DoseLog(db).start()
+
+# Notifications go out from a worker pool; the console is the fallback
+dispatcher = NotificationDispatcher([PlyerBackend(), ConsoleBackend()], title="Medicine Reminder")
+dispatcher.start()
+# Fired reminders survive a crash or sleep until delivered; doses missed
+# while the app was closed are fired late (see outbox.py)
+outbox = NotificationOutbox(db, dispatcher, on_missed=on_reminder_due)
+
+# Start Reminder Scheduler in a Separate Thread
+claims = OccurrenceClaims()
+scheduler = ReminderScheduler(on_due=on_reminder_due, load=load_upcoming_reminders,
+                              on_next=lambda entry: ui_events.put(("next", entry)))
+# Snooze/acknowledge; pending snoozes are part of the scheduler's first load
+snoozer = Snoozer(db, scheduler, dose_log)
+scheduler.start()
+outbox.start()
+
+# Hourly background move of long-past reminders into the archive table
+archiver = Archiver(db)
+archiver.start()
+
+root.after(CHANGE_POLL_MS, poll_changes)
+drain_ui_events()
 root.mainloop()
+outbox.stop()
+claims.stop()
+dose_log.stop()  # write out events still queued
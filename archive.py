@@ -0,0 +1,208 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+from database import DB_NAME, Database
+from recurrence import Recurrence
+from stats import timer
+
+# ----------------- ARCHIVAL -----------------
+# Moves reminders whose last dose is older than the archive horizon from
+# medicines into medicines_archive, then hands the freed pages back to the
+# filesystem with incremental vacuum.  The apps run it on a background
+# thread; it can also be run by hand:
+#
+#   python archive.py --days 30
+#   python archive.py --history 50   # the 50 most recent archived reminders
+#
+# Databases created before incremental auto_vacuum need one full VACUUM to
+# switch over.  That rewrites the whole file under the write lock, so only
+# the command above does it; the apps' background job skips reclaiming
+# space until then.
+#
+# MEDICINE_REMINDER_ARCHIVE_DAYS sets the horizon for the apps (default 30).
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("MEDICINE_REMINDER_ARCHIVE_DAYS", "30"))
+BATCH_SIZE = 500
+VACUUM_PAGES = 256
+
+COLUMNS = "id, name, date, time, due_at, rule"
+
+
+class Archiver:
+    """Batched archival and incremental vacuum for one database.
+
+    Each batch is its own short transaction, with a pause in between, so a
+    UI write waits for at most one batch rather than the whole job.
+    """
+
+    def __init__(self, db, after_days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, pause=0.05,
+                 vacuum_pages=VACUUM_PAGES, interval=3600):
+        self.db = db
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+        self._thread = None
+        self._stopped = threading.Event()
+
+    # ----------------- archival -----------------
+
+    def archive(self, now=None):
+        """Move everything past the horizon; returns the number of reminders moved."""
+        now = time.time() if now is None else now
+        cutoff = int(now - self.after_days * 86400)
+        moved = 0
+        while not self._stopped.is_set():
+            with timer("archive.batch") as t:
+                ids = [row[0] for row in self.db.query(
+                    "SELECT id FROM medicines WHERE due_at < ? AND rule IS NULL ORDER BY due_at, id LIMIT ?",
+                    (cutoff, self.batch_size))]
+                t.rows = len(ids)
+                if ids:
+                    self._move(ids, int(now))
+            moved += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            time.sleep(self.pause)
+        return moved + self._archive_finished_rules(cutoff, int(now))
+
+    def _archive_finished_rules(self, cutoff, now):
+        # Recurring reminders whose rule ended (UNTIL/COUNT) before the horizon
+        ids = []
+        for row_id, due_at, rule in self.db.query(
+                "SELECT id, due_at, rule FROM medicines WHERE rule IS NOT NULL"):
+            recurrence = Recurrence.parse(rule)
+            if due_at is not None and due_at < cutoff and recurrence.next_after(due_at, cutoff) is None:
+                ids.append(row_id)
+        for start in range(0, len(ids), self.batch_size):
+            self._move(ids[start:start + self.batch_size], now)
+        return len(ids)
+
+    def _move(self, ids, now):
+        marks = ",".join("?" * len(ids))
+        with self.db.transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO medicines_archive ({COLUMNS}, archived_at) "
+                         f"SELECT {COLUMNS}, ? FROM medicines WHERE id IN ({marks})", (now, *ids))
+            conn.execute(f"DELETE FROM medicines WHERE id IN ({marks})", ids)
+
+    # ----------------- space reclaim -----------------
+
+    def vacuum(self, convert=False):
+        """Release free pages a few at a time; returns the number released.
+
+        A database not yet in incremental mode is left alone unless
+        ``convert`` is set, which runs the one-time full VACUUM instead.
+        """
+        # Header values (auto_vacuum, freelist_count) are read on the writer:
+        # other connections may keep reporting what they saw when they opened.
+        with self.db.transaction() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode != 2:
+                if convert:
+                    with timer("archive.vacuum_convert"):
+                        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                        conn.execute("VACUUM")
+                return 0
+
+        released = 0
+        while not self._stopped.is_set():
+            with timer("archive.vacuum") as t, self.db.transaction() as conn:
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if before:
+                    conn.execute("BEGIN")
+                    # sqlite3 steps a PRAGMA only once and every step frees a
+                    # single page, so incremental_vacuum(N) is issued N times
+                    for _ in range(min(before, self.vacuum_pages)):
+                        conn.execute("PRAGMA incremental_vacuum")
+                freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                t.rows = freed
+            released += freed
+            if not freed:
+                break
+            time.sleep(self.pause)
+        return released
+
+    # ----------------- background job -----------------
+
+    def run_once(self):
+        try:
+            moved = self.archive()
+            released = self.vacuum()
+            if moved or released:
+                print(f"Archived {moved} reminders, released {released} free pages")
+        except Exception as e:
+            print(f"Archive error: {e}")
+
+    def start(self):
+        def run():
+            while not self._stopped.is_set():
+                self.run_once()
+                self._stopped.wait(self.interval)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopped.set()
+
+
+def history(db, limit):
+    """The ``limit`` most recently due archived reminders, newest first."""
+    rows, before = [], None
+    while len(rows) < limit:
+        page = db.page_history(before, min(limit - len(rows), BATCH_SIZE))
+        if not page:
+            break
+        rows.extend(page)
+        before = (page[-1][4], page[-1][0])
+    return rows
+
+
+def format_history(rows):
+    lines = [f"{'ID':>6}  {'Date':<10} {'Time':<8}  Medicine"]
+    for row_id, name, date, time_12, due_at, rule in rows:
+        recurrence = Recurrence.parse(rule)
+        repeat = f" ({recurrence.describe()})" if recurrence else ""
+        lines.append(f"{row_id:>6}  {date:<10} {time_12:<8}  {name}{repeat}")
+    if len(lines) == 1:
+        lines.append("No archived reminders.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive past reminders and reclaim free space.")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help=f"archive reminders older than this many days (default: {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--history", type=int, metavar="N",
+                        help="list the N most recently due archived reminders instead of archiving")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    db.setup()
+    if args.history is not None:
+        try:
+            print(format_history(history(db, args.history)))
+        finally:
+            db.close()
+        return 0
+
+    started = time.perf_counter()
+    try:
+        archiver = Archiver(db, args.days, args.batch_size, pause=0)
+        moved = archiver.archive()
+        released = archiver.vacuum(convert=True)
+    finally:
+        db.close()
+    print(f"Archived {moved} reminders, released {released} free pages ({time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import textwrap
+import time
+from datetime import datetime
+
+from database import Database
+from list_model import ReminderListModel, ReminderPager
+from recurrence import list_row, scheduler_entries
+from scheduler import ReminderScheduler
+from store import ReminderStore
+
+# ----------------- BENCHMARKS -----------------
+# Times the data and scheduling hot paths against synthetic reminder
+# databases and appends the numbers to a JSON file:
+#
+#   python benchmark.py                       # 1k and 100k rows
+#   python benchmark.py --sizes 1000 1000000  # include the 1M-row database
+#   python benchmark.py --only report --events 1000000 10000000
+#
+# Generated databases are cached in bench_data/ and reused between runs.
+
+DEFAULT_SIZES = [1_000, 100_000]
+DEFAULT_EVENTS = [10_000_000]  # dose-history size for the report benchmark
+DATA_DIR = "bench_data"
+RESULTS_FILE = "benchmark_results.json"
+
+NAMES = ["Metformin", "Lisinopril", "Atorvastatin", "Levothyroxine", "Amlodipine",
+         "Omeprazole", "Penadol", "Ibuprofen", "Vitamin D", "Insulin"]
+RULES = ["FREQ=DAILY", "FREQ=HOURLY;INTERVAL=8", "FREQ=WEEKLY;BYDAY=MO,WE,FR"]
+
+
+# ----------------- SYNTHETIC DATA -----------------
+
+def synthetic_rows(count, seed=42, recurring_ratio=0.01):
+    """Yield medicines rows spread over one year either side of now."""
+    rng = random.Random(seed)
+    now = int(time.time()) // 60 * 60
+    for i in range(count):
+        due_at = now + rng.randrange(-365 * 1440, 365 * 1440) * 60
+        moment = datetime.fromtimestamp(due_at)
+        rule = rng.choice(RULES) if rng.random() < recurring_ratio else None
+        yield (f"{rng.choice(NAMES)} {i % 997}", moment.strftime("%Y-%m-%d"),
+               moment.strftime("%I:%M %p"), due_at, rule)
+
+
+def build_database(path, count):
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    db = Database(tmp_path)
+    db.setup()
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO medicines (name, date, time, due_at, rule) VALUES (?, ?, ?, ?, ?)",
+                         synthetic_rows(count))
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def synthetic_events(count, medicines=20, seed=42):
+    """Yield dose_events rows: a year of notifications, most taken late-ish."""
+    rng = random.Random(seed)
+    now = int(time.time()) // 60 * 60
+    events = ("taken", "taken", "taken", "taken", "skipped", "snoozed")
+    for i in range(0, count, 2):
+        medicine_id = rng.randrange(1, medicines + 1)
+        due_at = now - rng.randrange(0, 365 * 1440) * 60
+        yield medicine_id, NAMES[medicine_id % len(NAMES)], due_at, "notified", due_at
+        yield medicine_id, NAMES[medicine_id % len(NAMES)], due_at, rng.choice(events), due_at + rng.randrange(0, 5400)
+
+
+def build_dose_database(path, count):
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    db = Database(tmp_path)
+    db.setup()
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO dose_events (medicine_id, name, due_at, event, at) VALUES (?, ?, ?, ?, ?)",
+                         synthetic_events(count))
+        conn.execute("INSERT INTO dose_totals (medicine_id, name) SELECT DISTINCT medicine_id, name FROM dose_events")
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+# ----------------- TIMING -----------------
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(name, rows, samples, **extra):
+    ordered = sorted(samples)
+    result = {
+        "benchmark": name,
+        "rows": rows,
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(ordered[len(ordered) // 2], 4),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 4),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+    result.update(extra)
+    return result
+
+
+# ----------------- HOT PATHS -----------------
+
+def bench_queries(db, rows, repeat):
+    now = int(time.time())
+    yield summarize("checker.upcoming_reminders", rows, measure(lambda: db.upcoming_reminders(now - 60), repeat))
+    yield summarize("checker.due_window", rows, measure(
+        lambda: db.query("SELECT id, name FROM medicines WHERE due_at >= ? AND due_at < ?", (now, now + 60)),
+        repeat * 10))
+    yield summarize("list.list_medicines", rows, measure(db.list_medicines, repeat))
+    pager = ReminderPager(db)
+    yield summarize("list.first_page", rows, measure(pager.first_page, repeat))
+    yield summarize("list.later_page", rows, measure(pager.later_page, repeat * 10))
+    for text in ("m", "metf", "metformin 12"):
+        yield summarize(f"search.{text.replace(' ', '_')}", rows, measure(lambda: db.search_medicines(text), repeat))
+    store = ReminderStore(db)
+    yield summarize("store.load", rows, measure(lambda: store.load(now - 60), repeat), cached=len(store))
+    yield summarize("store.upcoming_reminders", rows, measure(lambda: store.upcoming_reminders(now - 60), repeat))
+    yield summarize("store.first_page", rows, measure(ReminderPager(store).first_page, repeat * 10))
+    yield summarize("list.iter_medicines", rows, measure(lambda: sum(len(chunk) for chunk in db.iter_medicines()),
+                                                         repeat))
+
+
+def bench_writes(db, rows, repeat):
+    ops = max(repeat * 20, 50)
+    added = []
+
+    def add():
+        added.append(db.add_medicine("Benchmark", "2030-01-01", "08:00 AM")[0])
+
+    yield summarize("write.add_medicine", rows, measure(add, ops))
+    ids = iter(list(added))
+    yield summarize("write.update_medicine", rows,
+                    measure(lambda: db.update_medicine(next(ids), "Benchmark", "2030-01-02", "09:00 PM"), ops))
+    ids = iter(list(added))
+    yield summarize("write.delete_medicine", rows, measure(lambda: db.delete_medicine(next(ids)), ops))
+
+
+def bench_models(db, rows, repeat):
+    data = db.list_medicines()
+    now = time.time()
+    model = ReminderListModel()
+    yield summarize("model.load", rows, measure(lambda: model.load(list_row(row, now) for row in data), repeat))
+
+    rng = random.Random(7)
+    base = int(now)
+
+    def upsert():
+        row_id = rng.randrange(1, rows + 1)
+        model.upsert(row_id, "Benchmark", "2030-01-01", "08:00 AM", base + rng.randrange(-10 ** 7, 10 ** 7))
+
+    yield summarize("model.upsert", rows, measure(upsert, repeat * 100))
+
+
+def bench_scheduler(db, rows, repeat):
+    since = int(time.time()) - 60
+    upcoming = db.upcoming_reminders(since)
+
+    def load():
+        scheduler = ReminderScheduler(on_due=lambda key, payload, due_at: None)
+        for entry in scheduler_entries(upcoming, since):
+            scheduler.schedule(*entry)
+        return scheduler
+
+    yield summarize("scheduler.load", rows, measure(load, repeat), scheduled=len(upcoming))
+
+    scheduler = load()
+    rng = random.Random(11)
+    far = int(time.time()) + 86400
+
+    def reschedule():
+        scheduler.schedule(rng.randrange(1, rows + 1), far + rng.randrange(0, 10 ** 6), "Benchmark")
+
+    yield summarize("scheduler.schedule", rows, measure(reschedule, repeat * 100))
+
+
+# The report runs in a child process so its peak RSS is its own.  The
+# resource module is POSIX-only: on Windows no peak is reported.  ru_maxrss
+# is in bytes on macOS and in kilobytes elsewhere.
+_REPORT_CHILD = textwrap.dedent("""
+    import json, sys, time
+    import report
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    started = time.perf_counter()
+    until = int(time.time())
+    rows = report.report_database(sys.argv[1], until - 366 * 86400, until)
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak //= 1024
+    print(json.dumps({"elapsed_ms": (time.perf_counter() - started) * 1000, "medicines": len(rows),
+                      "peak_rss_kb": peak}))
+""")
+
+
+def bench_report(path, events, repeat):
+    samples, peaks = [], []
+    for _ in range(repeat):
+        result = json.loads(subprocess.run([sys.executable, "-c", _REPORT_CHILD, path], capture_output=True,
+                                           text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+                            .stdout.strip().splitlines()[-1])
+        samples.append(result["elapsed_ms"])
+        peaks.append(result["peak_rss_kb"])
+    peak_rss_mb = None if None in peaks else round(max(peaks) / 1024, 1)
+    return summarize("report.adherence", events, samples, peak_rss_mb=peak_rss_mb, medicines=result["medicines"])
+
+
+BENCHMARKS = {
+    "queries": bench_queries,
+    "writes": bench_writes,
+    "models": bench_models,
+    "scheduler": bench_scheduler,
+}
+
+
+# ----------------- RUNNER -----------------
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, groups, repeat, data_dir=DATA_DIR, events=DEFAULT_EVENTS):
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    if "report" in groups:
+        for count in events:
+            path = os.path.join(data_dir, f"doses_{count}.db")
+            started = time.perf_counter()
+            build_dose_database(path, count)
+            print(f"{count:>9} events: database ready in {time.perf_counter() - started:.1f}s")
+            result = bench_report(os.path.abspath(path), count, max(repeat // 2, 1))
+            peak = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.1f}"
+            print(f"{result['benchmark']:<30} {count:>9} events  p50 {result['p50_ms']:>10.3f} ms  "
+                  f"peak {peak:>8} MB")
+            results.append(result)
+        groups = [group for group in groups if group != "report"]
+        if not groups:
+            return results
+
+    for rows in sizes:
+        path = os.path.join(data_dir, f"medicines_{rows}.db")
+        started = time.perf_counter()
+        build_database(path, rows)
+        print(f"{rows:>9} rows: database ready in {time.perf_counter() - started:.1f}s")
+
+        # Writes go to a scratch copy so the cached database stays pristine
+        scratch = path + ".scratch"
+        source, target = sqlite3.connect(path), sqlite3.connect(scratch)
+        source.backup(target)
+        source.close()
+        target.close()
+
+        db = Database(scratch)
+        db.setup()
+        try:
+            for group in groups:
+                for result in BENCHMARKS[group](db, rows, repeat):
+                    print(f"{result['benchmark']:<30} {rows:>9} rows  p50 {result['p50_ms']:>10.3f} ms  "
+                          f"p95 {result['p95_ms']:>10.3f} ms")
+                    results.append(result)
+        finally:
+            db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(scratch + suffix):
+                    os.remove(scratch + suffix)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the reminder data and scheduling hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted([*BENCHMARKS, "report"]),
+                        default=[*BENCHMARKS, "report"])
+    parser.add_argument("--events", type=int, nargs="+", default=DEFAULT_EVENTS,
+                        help="dose-history sizes for the report benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"JSON results file (default: {RESULTS_FILE})")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.repeat, args.data_dir, args.events)
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    # The results file is a list of runs, newest last, so versions can be compared
+    runs = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            runs = json.load(f)
+    runs.append(record)
+    with open(args.output, "w") as f:
+        json.dump(runs, f, indent=2)
+    print(f"Results appended to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
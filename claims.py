@@ -0,0 +1,77 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+# ----------------- EXACTLY-ONCE FIRING -----------------
+# Any number of processes may schedule the same reminders from one database
+# (the Tk and Kivy apps, several windows, daemons on other machines).
+# Before an occurrence -- (medicine id, due time) -- goes out, it is claimed
+# in reminder_claims with a single atomic upsert.  The winner notifies and
+# marks it fired, and every other process backs off.  A winner that dies
+# before marking it fired leaves a lease behind.  The lease lapses after
+# LEASE_SECONDS, and a process that lost the race then tries again.
+
+LEASE_SECONDS = 60
+GIVE_UP_AFTER = 15 * 60  # doses later than this are not taken over any more
+
+
+class OccurrenceClaims:
+    """Claims occurrences for this process before they fire."""
+
+    def __init__(self, lease=LEASE_SECONDS, give_up_after=GIVE_UP_AFTER, owner=None):
+        self.lease = lease
+        self.give_up_after = give_up_after
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._retries = set()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def fire_once(self, db, medicine_id, due_at, fire):
+        """Call ``fire()`` unless the occurrence fired, or is firing, elsewhere.
+
+        Returns True when it fired here.  If ``fire()`` raises, the claim is
+        released so another process can try.
+        """
+        now = int(time.time())
+        claimed, lease_until = db.claim_occurrence(medicine_id, due_at, self.owner, now, now + self.lease)
+        if not claimed:
+            if lease_until is not None:
+                self._retry_at(lease_until, db, medicine_id, due_at, fire)
+            return False
+        try:
+            fire()
+        except BaseException:
+            db.release_claim(medicine_id, due_at, self.owner)
+            raise
+        db.finish_claim(medicine_id, due_at, self.owner, int(time.time()))
+        return True
+
+    def _retry_at(self, lease_until, db, medicine_id, due_at, fire):
+        # Someone else holds it; if their lease runs out unfired, take over
+        if lease_until > due_at + self.give_up_after:
+            return
+        with self._lock:
+            if self._stopped:
+                return
+
+            def retry():
+                with self._lock:
+                    self._retries.discard(timer)
+                try:
+                    self.fire_once(db, medicine_id, due_at, fire)
+                except Exception as e:
+                    print(f"Error firing reminder {medicine_id}: {e}")
+
+            timer = threading.Timer(max(lease_until - time.time(), 0) + 1, retry)
+            timer.daemon = True
+            self._retries.add(timer)
+        timer.start()
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            retries, self._retries = self._retries, set()
+        for timer in retries:
+            timer.cancel()
@@ -0,0 +1,261 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+from collections import Counter
+from functools import partial
+
+from claims import OccurrenceClaims
+from database import Database
+from doselog import DoseLog
+from notifier import ConsoleBackend, NotificationDispatcher, PlyerBackend
+from outbox import NotificationOutbox
+from recurrence import scheduler_entries
+from scheduler import ReminderScheduler
+from stats import timed
+
+# ----------------- HEADLESS REMINDER DAEMON -----------------
+# Serves every reminder database in a directory from one process, with no
+# Tk or Kivy imports:
+#
+#   python daemon.py /var/lib/reminders --status status.json
+#
+# All databases share a single ReminderScheduler (one heap, one thread).
+# Reminder keys are (path, id); the directory rescan is itself an entry in
+# the same heap, so nothing else wakes up in between.  Each dose is claimed
+# in its database before it goes out, so several daemons (or apps) can
+# serve the same files and every dose is still announced once.
+#
+# A fired dose goes through each database's notification outbox and is
+# logged as "notified" in its dose log, as in the apps.  The rescan entry
+# also replays the outboxes: undelivered notifications are retried, doses
+# missed while the daemon was down are fired when a database is first
+# opened, and again after the machine wakes from sleep.
+
+RESCAN_KEY = ("__rescan__", 0)
+
+
+class ReminderDaemon:
+    def __init__(self, directory, pattern="*.db", rescan_interval=30, backends=None, status_path=None):
+        self.directory = directory
+        self.pattern = pattern
+        self.rescan_interval = rescan_interval
+        self.status_path = status_path
+
+        self.scheduler = ReminderScheduler(on_due=self._on_due, load=self._initial_entries)
+        self.dispatcher = NotificationDispatcher(backends or [ConsoleBackend()])
+        self.claims = OccurrenceClaims()
+        self.databases = {}   # path -> Database
+        self.outboxes = {}    # path -> NotificationOutbox
+        self.dose_logs = {}   # path -> DoseLog
+        self._last_rescan = None
+        self._signatures = {}  # path -> (mtime, size) of the db and its WAL
+        self._ids = {}        # path -> ids currently scheduled
+        self.counters = Counter()
+        self.started_at = time.time()
+
+    # ----------------- lifecycle -----------------
+
+    def start(self):
+        self.dispatcher.start()
+        return self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+        self.claims.stop()
+        self.dispatcher.stop()
+
+    def close(self):
+        for db in self.databases.values():
+            db.close()
+        self.databases.clear()
+
+    def run(self):
+        thread = self.start()
+        try:
+            while thread.is_alive():
+                thread.join(1)
+        finally:
+            self.stop()
+            self.close()
+
+    # ----------------- scheduling -----------------
+
+    def _initial_entries(self):
+        self.rescan()
+        return [(RESCAN_KEY, time.time() + self.rescan_interval, None,
+                 lambda after: after + self.rescan_interval)]
+
+    def _on_due(self, key, payload, due_at):
+        if key == RESCAN_KEY:
+            self.rescan()
+            return
+        path, row_id = key
+        self._fire(path, row_id, payload, due_at)
+
+    def _fire(self, path, row_id, name, due_at):
+        db = self.databases.get(path)
+        if db is None:
+            return
+        due_at = int(due_at)
+        patient = os.path.splitext(os.path.basename(path))[0]
+
+        def fire():
+            self.outboxes[path].send(row_id, f"{name} ({patient})", due_at)
+            # Everything here runs on the scheduler thread, so the event is
+            # written at once instead of through a DoseLog writer thread per file
+            self.dose_logs[path].write([(row_id, name, due_at, "notified", int(time.time()))])
+
+        if self.claims.fire_once(db, row_id, due_at, fire):
+            self.counters["fired"] += 1
+        else:
+            self.counters["claimed_elsewhere"] += 1
+
+    @timed("daemon.rescan")
+    def rescan(self):
+        started = time.perf_counter()
+        paths = set(glob.glob(os.path.join(self.directory, self.pattern)))
+        opened = set(self.outboxes)
+
+        for path in set(self.databases) - paths:
+            self._drop(path)
+        for path in sorted(paths):
+            signature = _signature(path)
+            if signature is None or signature == self._signatures.get(path):
+                continue
+            try:
+                self._reload(path)
+                self._signatures[path] = signature
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Error loading {path}: {e}")
+
+        # A much longer gap than the interval means the machine slept, so
+        # doses may have come due unannounced
+        now = time.time()
+        woke = self._last_rescan is not None and now - self._last_rescan > 2 * self.rescan_interval
+        self._last_rescan = now
+        for path, outbox in list(self.outboxes.items()):
+            self._replay(path, outbox, missed=woke or path not in opened)
+
+        self.counters["rescans"] += 1
+        self.counters["rescan_ms"] += int((time.perf_counter() - started) * 1000)
+        self.write_status()
+
+    def _reload(self, path):
+        db = self.databases.get(path)
+        if db is None:
+            if not _is_reminder_db(path):
+                return
+            db = Database(path)
+            db.setup()
+            self.databases[path] = db
+            self.dose_logs[path] = DoseLog(db)
+            self.outboxes[path] = NotificationOutbox(db, self.dispatcher, on_missed=partial(self._fire, path))
+
+        since = int(time.time()) - self.scheduler.grace
+        rows = db.upcoming_reminders(since)
+        ids = {row[0] for row in rows}
+        for row_id, due_at, name, repeat in scheduler_entries(rows, since):
+            self.scheduler.schedule((path, row_id), due_at, name, repeat)
+        for row_id in self._ids.get(path, set()) - ids:
+            self.scheduler.cancel((path, row_id))
+        self._ids[path] = ids
+        self.counters["reloads"] += 1
+
+    def _drop(self, path):
+        for row_id in self._ids.pop(path, set()):
+            self.scheduler.cancel((path, row_id))
+        self._signatures.pop(path, None)
+        self.outboxes.pop(path, None)
+        self.dose_logs.pop(path, None)
+        self.databases.pop(path).close()
+
+    def _replay(self, path, outbox, missed):
+        try:
+            self.counters["replayed"] += outbox.replay(missed=missed)
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"Error replaying reminders for {path}: {e}")
+
+    # ----------------- health -----------------
+
+    def stats(self):
+        uptime = time.time() - self.started_at
+        return {
+            "uptime_s": round(uptime),
+            "databases": len(self.databases),
+            "scheduled": len(self.scheduler) - 1,  # minus the rescan entry
+            "next_due": self.scheduler.next_due(),
+            "fired": self.counters["fired"],
+            "fired_per_hour": round(self.counters["fired"] * 3600 / uptime, 2) if uptime else 0.0,
+            "claimed_elsewhere": self.counters["claimed_elsewhere"],
+            "replayed": self.counters["replayed"],
+            "notifications_delivered": self.dispatcher.delivered,
+            "notifications_failed": self.dispatcher.failed,
+            "rescans": self.counters["rescans"],
+            "reloads": self.counters["reloads"],
+            "avg_rescan_ms": round(self.counters["rescan_ms"] / self.counters["rescans"], 1)
+            if self.counters["rescans"] else 0.0,
+            "errors": self.counters["errors"],
+        }
+
+    def write_status(self):
+        if not self.status_path:
+            return
+        tmp_path = self.status_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+        os.replace(tmp_path, self.status_path)
+
+
+def _is_reminder_db(path):
+    # Checked read-only so unrelated files in the directory are left untouched
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medicines'").fetchone() is not None
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def _signature(path):
+    # Writers in WAL mode touch the -wal file rather than the database itself
+    try:
+        parts = [os.stat(path)]
+    except OSError:
+        return None
+    try:
+        parts.append(os.stat(path + "-wal"))
+    except OSError:
+        pass
+    return tuple((st.st_mtime_ns, st.st_size) for st in parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run reminders for every database in a directory, headless.")
+    parser.add_argument("directory")
+    parser.add_argument("--pattern", default="*.db", help="database file pattern (default: *.db)")
+    parser.add_argument("--interval", type=float, default=30, help="seconds between directory rescans")
+    parser.add_argument("--status", help="write health/throughput counters as JSON to this file")
+    parser.add_argument("--notify", choices=["console", "plyer"], default="console")
+    args = parser.parse_args(argv)
+
+    backends = [ConsoleBackend()] if args.notify == "console" else [PlyerBackend(), ConsoleBackend()]
+    daemon = ReminderDaemon(args.directory, args.pattern, args.interval, backends, args.status)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,581 @@
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from stats import timed, timer
+
+# ----------------- DATABASE SETUP -----------------
+DB_NAME = "medicine_reminder.db"
+
+# Bumped whenever a migration is added below (stored in PRAGMA user_version)
+SCHEMA_VERSION = 10
+
+_SEARCH_TOKEN_RE = re.compile(r"\w+")
+
+
+def due_timestamp(date, time_12):
+    """Epoch seconds for a 'YYYY-MM-DD' date and 'HH:MM AM/PM' time."""
+    return int(datetime.strptime(f"{date} {time_12}", "%Y-%m-%d %I:%M %p").timestamp())
+
+
+def create_schema(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS medicines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        due_at INTEGER,
+        rule TEXT
+    )
+    """)
+    migrate(conn)
+
+
+# ----------------- CONNECTION MANAGER -----------------
+
+class Database:
+    """Long-lived connections shared by the UI and the reminder thread.
+
+    All writes go through one writer connection guarded by a lock; every
+    thread that reads gets its own reader connection.  With WAL journaling
+    readers never block the writer (or each other), and each connection keeps
+    its prepared statements cached across calls.
+    """
+
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        # Only takes effect on a new, empty file; existing databases are
+        # converted once by the archiver (see archive.py)
+        self._writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._fts = None  # whether medicines_fts exists; checked on first search
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        # Durable across application crashes in WAL mode; only a power loss
+        # can roll back the last few commits.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def setup(self):
+        with self.transaction() as conn:
+            create_schema(conn)
+            prune_changes(conn)
+            prune_claims(conn)
+            prune_outbox(conn)
+            prune_snoozes(conn)
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            self._writer.close()
+
+    # ----------------- generic access -----------------
+
+    @timed("db.query", rows=len)
+    def query(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchall()
+
+    @timed("db.query_one")
+    def query_one(self, sql, params=()):
+        return self._reader().execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @timed("db.write")
+    def execute(self, sql, params=()):
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    # ----------------- medicines -----------------
+
+    def add_medicine(self, name, date, time_12, rule=None):
+        due_at = due_timestamp(date, time_12)
+        cursor = self.execute("INSERT INTO medicines (name, date, time, due_at, rule) VALUES (?, ?, ?, ?, ?)",
+                              (name, date, time_12, due_at, rule))
+        return cursor.lastrowid, due_at
+
+    def update_medicine(self, id, name, date, time_12, rule=None):
+        due_at = due_timestamp(date, time_12)
+        self.execute("UPDATE medicines SET name = ?, date = ?, time = ?, due_at = ?, rule = ? WHERE id = ?",
+                     (name, date, time_12, due_at, rule, id))
+        return due_at
+
+    def delete_medicine(self, id):
+        self.execute("DELETE FROM medicines WHERE id = ?", (id,))
+
+    # ----------------- reminder claims -----------------
+    # One row per fired (or firing) occurrence, shared by every process that
+    # opens the file; see claims.py.
+
+    @timed("db.claim")
+    def claim_occurrence(self, medicine_id, due_at, owner, now, lease_until):
+        """Try to take the occurrence for ``owner`` until ``lease_until``.
+
+        Returns ``(True, lease_until)`` when it was taken, ``(False,
+        lease_until)`` while another owner's lease runs, or ``(False, None)``
+        once it has fired.  The upsert only overwrites an unfired claim whose
+        lease has lapsed, so two processes can never both win.
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute("""
+            INSERT INTO reminder_claims (medicine_id, due_at, owner, lease_until) VALUES (?, ?, ?, ?)
+            ON CONFLICT (medicine_id, due_at) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until
+            WHERE reminder_claims.fired_at IS NULL
+              AND (reminder_claims.lease_until < ? OR reminder_claims.owner = excluded.owner)
+            """, (medicine_id, due_at, owner, lease_until, now))
+            if cursor.rowcount == 1:
+                return True, lease_until
+            fired_at, held_until = conn.execute(
+                "SELECT fired_at, lease_until FROM reminder_claims WHERE medicine_id = ? AND due_at = ?",
+                (medicine_id, due_at)).fetchone()
+            return False, None if fired_at is not None else held_until
+
+    def finish_claim(self, medicine_id, due_at, owner, fired_at):
+        self.execute("UPDATE reminder_claims SET fired_at = ? WHERE medicine_id = ? AND due_at = ? AND owner = ?",
+                     (fired_at, medicine_id, due_at, owner))
+
+    def release_claim(self, medicine_id, due_at, owner):
+        self.execute("DELETE FROM reminder_claims WHERE medicine_id = ? AND due_at = ? AND owner = ? "
+                     "AND fired_at IS NULL", (medicine_id, due_at, owner))
+
+    def list_medicines(self):
+        return self.query("SELECT id, name, date, time, due_at, rule FROM medicines ORDER BY due_at, id")
+
+    def page_medicines(self, after=None, before=None, limit=200):
+        """One page of one-off medicines in (due_at, id) order.
+
+        Keyset pagination: ``after``/``before`` are the (due_at, id) of the
+        row just outside the page, so each page is one range scan of
+        idx_medicines_due_at however deep into the table it is.
+        """
+        if before is not None:
+            rows = self.query("""
+            SELECT id, name, date, time, due_at, rule FROM medicines
+            WHERE (due_at, id) < (?, ?) AND rule IS NULL ORDER BY due_at DESC, id DESC LIMIT ?
+            """, (*before, limit))
+            rows.reverse()
+            return rows
+        if after is None:
+            after = (float("-inf"), 0)
+        return self.query("""
+        SELECT id, name, date, time, due_at, rule FROM medicines
+        WHERE (due_at, id) > (?, ?) AND rule IS NULL ORDER BY due_at, id LIMIT ?
+        """, (*after, limit))
+
+    def recurring_medicines(self):
+        return self.query("SELECT id, name, date, time, due_at, rule FROM medicines WHERE rule IS NOT NULL")
+
+    def page_history(self, before=None, limit=200):
+        """Archived reminders, newest first, keyset-paginated like page_medicines."""
+        if before is None:
+            before = (float("inf"), 0)
+        return self.query("""
+        SELECT id, name, date, time, due_at, rule FROM medicines_archive
+        WHERE (due_at, id) < (?, ?) ORDER BY due_at DESC, id DESC LIMIT ?
+        """, (*before, limit))
+
+    # ----------------- change tracking -----------------
+
+    def data_version(self):
+        # Changes whenever another connection (in any process) commits
+        return self.query_one("PRAGMA data_version")[0]
+
+    def change_seq(self):
+        return self.query_one("SELECT COALESCE(MAX(seq), 0) FROM medicine_changes")[0]
+
+    def changes_since(self, seq, limit=5000):
+        """Rows changed after change ``seq``.
+
+        Returns ``(latest_seq, rows, deleted_ids)``, or ``(latest_seq, None,
+        None)`` when the log no longer reaches back to ``seq`` or more than
+        ``limit`` reminders changed -- the caller should reload instead.
+        """
+        first, latest = self.query_one("SELECT MIN(seq), MAX(seq) FROM medicine_changes")
+        if latest is None or latest <= seq:
+            return seq, [], []
+        if first > seq + 1:
+            return latest, None, None
+        ids = [row[0] for row in self.query(
+            "SELECT DISTINCT medicine_id FROM medicine_changes WHERE seq > ? AND seq <= ? LIMIT ?",
+            (seq, latest, limit + 1))]
+        if len(ids) > limit:
+            return latest, None, None
+        rows = self.query(f"""
+        SELECT id, name, date, time, due_at, rule FROM medicines WHERE id IN ({",".join("?" * len(ids))})
+        """, ids)
+        found = {row[0] for row in rows}
+        return latest, rows, [row_id for row_id in ids if row_id not in found]
+
+    def iter_medicines(self, chunk_size=500):
+        """Yield the sorted medicine list in chunks without loading it all."""
+        return self.iter_query("SELECT id, name, date, time, due_at, rule FROM medicines ORDER BY due_at, id",
+                               chunk_size=chunk_size)
+
+    def iter_query(self, sql, params=(), chunk_size=500, dedicated=False):
+        """Yield the rows of ``sql`` in lists of up to ``chunk_size``.
+
+        With ``dedicated`` the rows are read on a connection of their own,
+        closed when the generator finishes.  That suits one-off jobs on
+        short-lived threads, whose shared reader would otherwise stay open
+        until ``close()``.
+        """
+        conn = self._connect() if dedicated else self._reader()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                with timer("db.fetch_chunk") as t:
+                    rows = cursor.fetchmany(chunk_size)
+                    t.rows = len(rows)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            if dedicated:
+                conn.close()
+
+    def upcoming_reminders(self, since):
+        # One-off reminders still ahead, plus every recurring one (expanded
+        # lazily by the caller). Two index range scans instead of an OR scan.
+        return self.query("""
+        SELECT id, due_at, name, rule FROM medicines WHERE due_at >= ? AND rule IS NULL
+        UNION ALL
+        SELECT id, due_at, name, rule FROM medicines WHERE rule IS NOT NULL
+        """, (since,))
+
+    def search_medicines(self, text, limit=500):
+        """Medicines whose name has a word starting with each word of ``text``.
+
+        Returns at most ``limit`` rows in list order (due_at, id), shaped like
+        ``list_medicines()``.
+        """
+        words = _SEARCH_TOKEN_RE.findall(text)
+        if not words:
+            return []
+        if self._fts is None:
+            self._fts = self.query_one(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medicines_fts'") is not None
+        if self._fts:
+            # "metf"* "500"* -- every word must prefix-match some word of the name
+            match = " ".join('"{}"*'.format(word) for word in words)
+            return self.query("""
+            SELECT m.id, m.name, m.date, m.time, m.due_at, m.rule
+            FROM medicines_fts JOIN medicines AS m ON m.id = medicines_fts.rowid
+            WHERE medicines_fts MATCH ? ORDER BY m.due_at, m.id LIMIT ?
+            """, (match, limit))
+        # No FTS5 in this SQLite build: name prefix through the NOCASE index
+        return self.query("""
+        SELECT id, name, date, time, due_at, rule FROM medicines
+        WHERE name LIKE ? ORDER BY due_at, id LIMIT ?
+        """, (" ".join(words) + "%", limit))
+
+
+# ----------------- MIGRATIONS -----------------
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        _migrate_due_at(conn)
+    if version < 2:
+        _migrate_rule(conn)
+    if version < 3:
+        _migrate_search(conn)
+    if version < 4:
+        _migrate_changes(conn)
+    if version < 5:
+        _migrate_archive(conn)
+    if version < 6:
+        _migrate_dose_log(conn)
+    if version < 7:
+        _migrate_claims(conn)
+    if version < 8:
+        _migrate_outbox(conn)
+    if version < 9:
+        _migrate_snoozes(conn)
+    if version < 10:
+        _migrate_outbox_attempts(conn)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _migrate_due_at(conn):
+    # v1: integer epoch-seconds due time next to the TEXT date/time pair, so
+    # due-window queries and sorted listings can use an index.
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(medicines)")}
+    if "due_at" not in columns:
+        conn.execute("ALTER TABLE medicines ADD COLUMN due_at INTEGER")
+
+    rows = conn.execute("SELECT id, date, time FROM medicines WHERE due_at IS NULL").fetchall()
+    updates = []
+    for row_id, date, time_12 in rows:
+        try:
+            updates.append((due_timestamp(date, time_12), row_id))
+        except ValueError:
+            print(f"Migration: leaving reminder {row_id} without a due time ({date} {time_12})")
+    conn.executemany("UPDATE medicines SET due_at = ? WHERE id = ?", updates)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_due_at ON medicines (due_at, id)")
+
+
+def _migrate_rule(conn):
+    # v2: recurrence rule (RRULE subset, see recurrence.py); NULL for one-off
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(medicines)")}
+    if "rule" not in columns:
+        conn.execute("ALTER TABLE medicines ADD COLUMN rule TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_recurring ON medicines (id) WHERE rule IS NOT NULL")
+
+
+def _migrate_search(conn):
+    # v3: FTS5 index over medicine names for as-you-type search, kept in step
+    # with medicines by triggers.  prefix='1 2 3' stores short prefixes so
+    # the first few keystrokes don't scan the whole term list.
+    try:
+        conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS medicines_fts
+        USING fts5(name, content='medicines', content_rowid='id', prefix='1 2 3')
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Migration: FTS5 unavailable ({e}), search falls back to a name prefix index")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_name ON medicines (name COLLATE NOCASE)")
+        return
+
+    # One statement per execute(): executescript() would commit mid-migration
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_insert AFTER INSERT ON medicines BEGIN
+        INSERT INTO medicines_fts (rowid, name) VALUES (new.id, new.name);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_delete AFTER DELETE ON medicines BEGIN
+        INSERT INTO medicines_fts (medicines_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_update AFTER UPDATE OF name ON medicines BEGIN
+        INSERT INTO medicines_fts (medicines_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO medicines_fts (rowid, name) VALUES (new.id, new.name);
+    END
+    """)
+    conn.execute("INSERT INTO medicines_fts (medicines_fts) VALUES ('rebuild')")
+
+
+def _migrate_changes(conn):
+    # v4: append-only log of changed medicine ids, written by triggers, so
+    # other connections and processes can fetch just what changed since the
+    # last change they saw (see ChangeWatcher).
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS medicine_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        medicine_id INTEGER NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicine_changes_insert AFTER INSERT ON medicines BEGIN
+        INSERT INTO medicine_changes (medicine_id) VALUES (new.id);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicine_changes_update AFTER UPDATE ON medicines BEGIN
+        INSERT INTO medicine_changes (medicine_id) VALUES (new.id);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS medicine_changes_delete AFTER DELETE ON medicines BEGIN
+        INSERT INTO medicine_changes (medicine_id) VALUES (old.id);
+    END
+    """)
+
+
+def _migrate_archive(conn):
+    # v5: reminders past the archive horizon move here (see archive.py), so
+    # medicines only holds what the lists and the checker still need.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS medicines_archive (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        due_at INTEGER,
+        rule TEXT,
+        archived_at INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medicines_archive_due_at ON medicines_archive (due_at, id)")
+
+
+def _migrate_dose_log(conn):
+    # v6: append-only dose events plus rollups the writer keeps current in
+    # the same transaction (see doselog.py), so adherence summaries read a
+    # few rollup rows instead of scanning every event.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dose_events (
+        id INTEGER PRIMARY KEY,
+        medicine_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        due_at INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        at INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dose_events_medicine ON dose_events (medicine_id, due_at)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dose_daily (
+        day TEXT NOT NULL,
+        medicine_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        notified INTEGER NOT NULL DEFAULT 0,
+        taken INTEGER NOT NULL DEFAULT 0,
+        skipped INTEGER NOT NULL DEFAULT 0,
+        snoozed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, medicine_id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS dose_totals (
+        medicine_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        notified INTEGER NOT NULL DEFAULT 0,
+        taken INTEGER NOT NULL DEFAULT 0,
+        skipped INTEGER NOT NULL DEFAULT 0,
+        snoozed INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+
+def _migrate_claims(conn):
+    # v7: per-occurrence claim/fired state, so several app instances or
+    # daemons sharing the file announce each dose exactly once (claims.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reminder_claims (
+        medicine_id INTEGER NOT NULL,
+        due_at INTEGER NOT NULL,
+        owner TEXT NOT NULL,
+        lease_until INTEGER NOT NULL,
+        fired_at INTEGER,
+        PRIMARY KEY (medicine_id, due_at)
+    ) WITHOUT ROWID
+    """)
+
+
+def _migrate_outbox(conn):
+    # v8: fired reminders waiting for (or done with) delivery; undelivered
+    # ones are sent again after a crash or sleep (see outbox.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY,
+        medicine_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        due_at INTEGER NOT NULL,
+        created_at INTEGER NOT NULL,
+        delivered_at INTEGER,
+        UNIQUE (medicine_id, due_at)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_due_at ON notification_outbox (due_at)")
+
+
+def _migrate_snoozes(conn):
+    # v9: at most one pending snooze per reminder (see snooze.py); due_at is
+    # the dose that was snoozed, remind_at when it comes back
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS snoozes (
+        medicine_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        due_at INTEGER NOT NULL,
+        remind_at INTEGER NOT NULL
+    )
+    """)
+
+
+def _migrate_outbox_attempts(conn):
+    # v10: when each undelivered entry was last handed to the dispatcher, and
+    # how often, so replays back off instead of resending it every check
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(notification_outbox)")}
+    if "attempted_at" not in columns:
+        conn.execute("ALTER TABLE notification_outbox ADD COLUMN attempted_at INTEGER")
+    if "attempts" not in columns:
+        conn.execute("ALTER TABLE notification_outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+
+def prune_changes(conn, keep=10000):
+    # Watchers that fall further behind than this reload in full
+    conn.execute("DELETE FROM medicine_changes WHERE seq <= (SELECT MAX(seq) FROM medicine_changes) - ?", (keep,))
+
+
+def prune_claims(conn, keep_days=7):
+    # Occurrences this old can no longer fire (see ReminderScheduler.grace)
+    conn.execute("DELETE FROM reminder_claims WHERE due_at < CAST(strftime('%s', 'now') AS INTEGER) - ?",
+                 (keep_days * 86400,))
+
+
+def prune_outbox(conn, keep_days=7):
+    # Far outside any replay window, delivered or not
+    conn.execute("DELETE FROM notification_outbox WHERE due_at < CAST(strftime('%s', 'now') AS INTEGER) - ?",
+                 (keep_days * 86400,))
+
+
+def prune_snoozes(conn, keep_days=7):
+    conn.execute("DELETE FROM snoozes WHERE remind_at < CAST(strftime('%s', 'now') AS INTEGER) - ?",
+                 (keep_days * 86400,))
+
+
+# ----------------- CHANGE DETECTION -----------------
+
+class ChangeWatcher:
+    """Notices commits from other connections or processes.
+
+    ``poll()`` costs one ``PRAGMA data_version`` while nothing has changed.
+    After a commit it returns ``(rows, deleted_ids)`` for the reminders
+    changed since the previous poll, ``(None, None)`` when the caller should
+    reload everything, or ``None`` when nothing changed.  Call it from one
+    thread: data_version is per connection and readers are per thread.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.seq = db.change_seq()
+        self._version = db.data_version()
+
+    def poll(self):
+        version = self.db.data_version()
+        if version == self._version:
+            return None
+        self._version = version
+        self.seq, rows, deleted = self.db.changes_since(self.seq)
+        if rows is None:
+            return None, None
+        if not rows and not deleted:
+            return None
+        return rows, deleted
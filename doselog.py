@@ -0,0 +1,179 @@
+import argparse
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from database import DB_NAME, Database
+from stats import timer
+
+# ----------------- DOSE ADHERENCE LOG -----------------
+# Every reminder that goes out and every answer to it (taken, skipped,
+# snoozed) is appended to dose_events.  Events are queued and written in
+# batches; each batch also bumps the per-day (dose_daily) and per-medicine
+# (dose_totals) rollups in the same transaction, so summaries read those
+# instead of the raw log.
+#
+#   python doselog.py --days 30     # adherence report for the last 30 days
+
+EVENTS = ("notified", "taken", "skipped", "snoozed")
+
+
+class DoseLog:
+    """Batched, append-only writer for dose events.
+
+    ``record()`` only enqueues; a writer thread flushes once ``batch_size``
+    events are waiting or ``flush_interval`` seconds after the first one.
+    """
+
+    def __init__(self, db, batch_size=100, flush_interval=2.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._notified = {}  # medicine id -> due time of its latest notification
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(10)
+
+    def record(self, medicine_id, name, due_at, event, at=None):
+        if event not in EVENTS:
+            raise ValueError(f"unknown dose event {event!r}")
+        if event == "notified":
+            self._notified[medicine_id] = due_at
+        self._queue.put((medicine_id, name, int(due_at), event, int(time.time() if at is None else at)))
+
+    def last_notified(self, medicine_id):
+        """Due time of the dose most recently notified for ``medicine_id``."""
+        return self._notified.get(medicine_id)
+
+    def answered(self, medicine_id, due_at):
+        """Whether the dose due at ``due_at`` was marked taken or skipped."""
+        return self.db.query_one(
+            "SELECT 1 FROM dose_events WHERE medicine_id = ? AND due_at = ? AND event IN ('taken', 'skipped')",
+            (medicine_id, int(due_at))) is not None
+
+    # ----------------- writer -----------------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} dose events: {e}")
+            if stopping:
+                return
+
+    def write(self, events):
+        """Append ``events`` and fold them into the rollups in one transaction."""
+        daily, totals, names = Counter(), Counter(), {}
+        for medicine_id, name, due_at, event, at in events:
+            day = datetime.fromtimestamp(due_at).strftime("%Y-%m-%d")
+            daily[day, medicine_id, event] += 1
+            totals[medicine_id, event] += 1
+            names[medicine_id] = name
+
+        with timer("doselog.write") as t, self.db.transaction() as conn:
+            t.rows = len(events)
+            conn.executemany("INSERT INTO dose_events (medicine_id, name, due_at, event, at) VALUES (?, ?, ?, ?, ?)",
+                             events)
+            conn.executemany(_rollup_sql("dose_daily", "day, medicine_id"),
+                             [(day, medicine_id, names[medicine_id], *_counts(event, count))
+                              for (day, medicine_id, event), count in daily.items()])
+            conn.executemany(_rollup_sql("dose_totals", "medicine_id"),
+                             [(medicine_id, names[medicine_id], *_counts(event, count))
+                              for (medicine_id, event), count in totals.items()])
+
+
+def _counts(event, count):
+    return tuple(count if name == event else 0 for name in EVENTS)
+
+
+def _rollup_sql(table, key):
+    placeholders = ", ".join("?" * (key.count(",") + 2 + len(EVENTS)))
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in EVENTS)
+    return (f"INSERT INTO {table} ({key}, name, {', '.join(EVENTS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({key}) DO UPDATE SET name = excluded.name, {updates}")
+
+
+# ----------------- SUMMARIES -----------------
+# Read the rollups only; a summary over months is a few hundred rows.
+
+def adherence(db, since=None, until=None):
+    """Per-medicine ``(id, name, notified, taken, skipped, snoozed)`` between
+    two dates (inclusive, 'YYYY-MM-DD'); all time when both are omitted."""
+    if since is None and until is None:
+        return db.query(f"SELECT medicine_id, name, {', '.join(EVENTS)} FROM dose_totals ORDER BY name")
+    return db.query(f"""
+    SELECT medicine_id, MAX(name), {', '.join(f'SUM({name})' for name in EVENTS)} FROM dose_daily
+    WHERE day >= ? AND day <= ? GROUP BY medicine_id ORDER BY MAX(name)
+    """, (since or "0000-00-00", until or "9999-99-99"))
+
+
+def daily_adherence(db, since, until):
+    """Per-day ``(day, notified, taken, skipped, snoozed)`` totals."""
+    return db.query(f"""
+    SELECT day, {', '.join(f'SUM({name})' for name in EVENTS)} FROM dose_daily
+    WHERE day >= ? AND day <= ? GROUP BY day ORDER BY day
+    """, (since, until))
+
+
+def format_adherence(rows):
+    lines = [f"{'Medicine':<24}{'Notified':>9}{'Taken':>7}{'Skipped':>9}{'Snoozed':>9}{'Rate':>7}"]
+    for medicine_id, name, notified, taken, skipped, snoozed in rows:
+        rate = f"{taken * 100 // notified}%" if notified else "-"
+        lines.append(f"{name[:23]:<24}{notified:>9}{taken:>7}{skipped:>9}{snoozed:>9}{rate:>7}")
+    if len(lines) == 1:
+        lines.append("No doses recorded yet.")
+    return "\n".join(lines)
+
+
+def recent_days(days, today=None):
+    """``(since, until)`` covering the last ``days`` days, for adherence()."""
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show dose adherence from the rollup tables.")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--days", type=int, default=30, help="report on the last N days (0 = all time)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    db.setup()
+    try:
+        rows = adherence(db, *recent_days(args.days)) if args.days else adherence(db)
+    finally:
+        db.close()
+    print(format_adherence(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
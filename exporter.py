@@ -0,0 +1,197 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from database import DB_NAME, Database
+
+# ----------------- EXPORT -----------------
+# Streams reminders out of the database as CSV (name,date,time,repeat, the
+# format importer.py reads), JSON Lines or iCalendar:
+#
+#   python exporter.py reminders.csv
+#   python exporter.py reminders.ics --include-archive
+#
+# Rows come off a cursor in chunks and go through a generator pipeline
+# straight to the file, so memory use is flat and output starts at once
+# whatever the size of the table.
+
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "jsonl", "ics")
+
+SELECT_SQL = "SELECT id, name, date, time, due_at, rule FROM medicines ORDER BY due_at, id"
+SELECT_WITH_ARCHIVE_SQL = """
+SELECT id, name, date, time, due_at, rule FROM medicines_archive
+UNION ALL
+SELECT id, name, date, time, due_at, rule FROM medicines
+ORDER BY due_at, id
+"""
+
+
+def iter_reminders(db, include_archive=False, chunk_size=CHUNK_SIZE):
+    """Yield ``(id, name, date, time, due_at, rule)`` rows one at a time."""
+    # Exports run on their own threads: read on a connection that is closed
+    # afterwards rather than a per-thread reader that lives until db.close()
+    chunks = db.iter_query(SELECT_WITH_ARCHIVE_SQL if include_archive else SELECT_SQL, chunk_size=chunk_size,
+                           dedicated=True)
+    try:
+        for rows in chunks:
+            yield from rows
+    finally:
+        chunks.close()
+
+
+# ----------------- WRITERS -----------------
+# Each writer takes the row iterator and yields chunks of output text.
+
+class _Lines:
+    # csv.writer target that hands back what was written since the last call
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def take(self):
+        text = "".join(self.parts)
+        self.parts.clear()
+        return text
+
+
+def write_csv(rows):
+    buffer = _Lines()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["name", "date", "time", "repeat"])
+    yield buffer.take()
+    for row_id, name, date, time_12, due_at, rule in rows:
+        writer.writerow([name, date, time_12, rule or ""])
+        yield buffer.take()
+
+
+def write_jsonl(rows):
+    for row_id, name, date, time_12, due_at, rule in rows:
+        yield json.dumps({"id": row_id, "name": name, "date": date, "time": time_12, "due_at": due_at,
+                          "rule": rule}) + "\n"
+
+
+def _ics_escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    # RFC 5545: content lines longer than 75 octets continue on lines
+    # starting with a space
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    parts, current = [], ""
+    for char in line:
+        if len((current + char).encode("utf-8")) > (75 if not parts else 74):
+            parts.append(current)
+            current = ""
+        current += char
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def write_ics(rows):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Medicine Reminder App//EN\r\n"
+    for row_id, name, date, time_12, due_at, rule in rows:
+        if due_at is None:
+            continue  # no valid time to put in DTSTART
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:medicine-{row_id}@medicine-reminder",
+            f"DTSTAMP:{stamp}",
+            # Floating local time, as entered in the app
+            f"DTSTART:{datetime.fromtimestamp(due_at).strftime('%Y%m%dT%H%M%S')}",
+            f"SUMMARY:{_ics_escape(name)}",
+        ]
+        if rule:
+            lines.append(f"RRULE:{_ics_rule(rule)}")
+        lines.append("END:VEVENT")
+        yield "".join(_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+
+def _ics_rule(rule):
+    # Stored rules use UNTIL=YYYY-MM-DD (the whole day included).  UNTIL must
+    # have DTSTART's value type, a local DATE-TIME here, so it becomes the
+    # last second of that day.
+    parts = []
+    for part in rule.split(";"):
+        key, _, value = part.partition("=")
+        if key.upper() == "UNTIL":
+            value = value.replace("-", "")
+            part = f"{key}={value}T235959" if len(value) == 8 else f"{key}={value}"
+        parts.append(part)
+    return ";".join(parts)
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "ics": write_ics}
+
+
+# ----------------- EXPORT -----------------
+
+def export_file(db, path, fmt=None, include_archive=False):
+    """Export to ``path``; returns the number of reminders written."""
+    fmt = fmt or detect_format(path)
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    # Written to a temporary file first so a failed export never leaves a
+    # truncated file in place of a good one
+    tmp_path = path + ".tmp"
+    newline = "" if fmt in ("csv", "ics") else None
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline=newline) as f:
+            for text in WRITERS[fmt](counted(iter_reminders(db, include_archive))):
+                f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("ical", "ics"):
+        return "ics"
+    if extension in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    return "csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export medicine reminders to CSV, JSON Lines or iCalendar.")
+    parser.add_argument("path", help="output file; the format follows the extension (.csv, .jsonl, .ics)")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--format", choices=FORMATS, help="override detection by file extension")
+    parser.add_argument("--include-archive", action="store_true", help="also export archived reminders")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    db.setup()
+    started = time.perf_counter()
+    try:
+        count = export_file(db, args.path, args.format, args.include_archive)
+    finally:
+        db.close()
+    print(f"Exported {count} reminders to {args.path} ({time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import csv
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from database import DB_NAME, Database
+from recurrence import Recurrence
+
+# ----------------- BULK IMPORT -----------------
+# Streams reminders from a CSV file (name,date,time[,repeat]) or an
+# iCalendar file (one VEVENT per reminder) into the medicines table.
+#
+#   python importer.py schedules.csv
+#   python importer.py calendar.ics --db other.db --rejects rejected.txt
+#
+# Rows are validated with pre-compiled patterns instead of strptime and
+# written with executemany in batches, all inside a single transaction.
+
+BATCH_SIZE = 1000
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp])\.?[Mm]\.?\s*$")
+_DATE_RE = re.compile(r"^\s*(\d{4})-(\d{2})-(\d{2})\s*$")
+_ICS_DT_RE = re.compile(r"^(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})?(Z?)$")
+
+INSERT_SQL = "INSERT INTO medicines (name, date, time, due_at, rule) VALUES (?, ?, ?, ?, ?)"
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []  # (line number, reason, raw line)
+
+    def __str__(self):
+        return f"Imported {self.imported} reminders, rejected {len(self.rejected)}."
+
+
+@lru_cache(maxsize=256)
+def parse_repeat(text):
+    # Schedules repeat a handful of distinct rules; parse each one once
+    recurrence = Recurrence.from_text(text)
+    return str(recurrence) if recurrence else None
+
+
+def parse_reminder(name, date_str, time_str, repeat=""):
+    """Validate one reminder; returns an INSERT tuple or raises ValueError."""
+    name = name.strip()
+    if not name:
+        raise ValueError("missing medicine name")
+
+    date_match = _DATE_RE.match(date_str)
+    if not date_match:
+        raise ValueError(f"invalid date {date_str!r}, expected YYYY-MM-DD")
+    year, month, day = map(int, date_match.groups())
+
+    time_match = _TIME_RE.match(time_str)
+    if not time_match:
+        raise ValueError(f"invalid time {time_str!r}, expected HH:MM AM/PM")
+    hour, minute = int(time_match.group(1)), int(time_match.group(2))
+    if not 1 <= hour <= 12 or minute > 59:
+        raise ValueError(f"invalid time {time_str!r}, expected HH:MM AM/PM")
+    suffix = "PM" if time_match.group(3) in "Pp" else "AM"
+    hour24 = hour % 12 + (12 if suffix == "PM" else 0)
+
+    # Raises ValueError for impossible dates such as 2025-02-30
+    due_at = int(datetime(year, month, day, hour24, minute).timestamp())
+    return (name, f"{year:04d}-{month:02d}-{day:02d}", f"{hour:02d}:{minute:02d} {suffix}",
+            due_at, parse_repeat(repeat.strip()) if repeat else None)
+
+
+# ----------------- READERS -----------------
+# Each reader yields (line number, raw text, INSERT tuple or ValueError).
+
+def read_csv(lines):
+    reader = csv.reader(lines)
+    for row in reader:
+        line_no = reader.line_num
+        if not row or not any(field.strip() for field in row):
+            continue
+        if line_no == 1 and row[0].strip().lower() in ("name", "medicine", "medicine name"):
+            continue  # header
+        try:
+            if len(row) < 3:
+                raise ValueError("expected name,date,time[,repeat]")
+            yield line_no, ",".join(row), parse_reminder(*row[:4])
+        except ValueError as e:
+            yield line_no, ",".join(row), e
+
+
+def _unfold(lines):
+    # RFC 5545 content lines may be folded onto continuation lines that
+    # start with a space or tab.
+    current, start = None, 0
+    for line_no, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, line_no
+    if current is not None:
+        yield start, current
+
+
+def _ics_datetime(params, value):
+    if "VALUE=DATE" in params.upper() and "VALUE=DATE-TIME" not in params.upper():
+        raise ValueError("all-day events have no reminder time")
+    match = _ICS_DT_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"invalid DTSTART {value!r}")
+    year, month, day, hour, minute = map(int, match.groups()[:5])
+    moment = datetime(year, month, day, hour, minute)
+    if match.group(7):
+        # UTC -> local wall-clock time; TZID-qualified times are taken as local
+        moment = moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return moment
+
+
+def read_ics(lines):
+    event = None
+    for line_no, line in _unfold(lines):
+        key, _, value = line.partition(":")
+        name, _, params = key.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.strip().upper() == "VEVENT":
+            event = {"line": line_no}
+        elif event is None:
+            continue
+        elif name == "END" and value.strip().upper() == "VEVENT":
+            try:
+                if "DTSTART" not in event:
+                    raise ValueError("event without DTSTART")
+                moment = _ics_datetime(*event["DTSTART"])
+                rule = None
+                if "RRULE" in event:
+                    rule = str(Recurrence.parse(event["RRULE"]))
+                yield event["line"], event.get("SUMMARY", ""), (
+                    parse_reminder(event.get("SUMMARY", ""), moment.strftime("%Y-%m-%d"),
+                                   moment.strftime("%I:%M %p"))[:4] + (rule,))
+            except (ValueError, KeyError) as e:
+                yield event["line"], event.get("SUMMARY", ""), ValueError(str(e) or "invalid event")
+            event = None
+        elif name == "SUMMARY":
+            event["SUMMARY"] = value.replace("\\,", ",").replace("\\;", ";").replace("\\n", " ")
+        elif name == "DTSTART":
+            event["DTSTART"] = (params, value)
+        elif name == "RRULE":
+            event["RRULE"] = value
+
+
+READERS = {"csv": read_csv, "ics": read_ics}
+
+
+# ----------------- IMPORT -----------------
+
+def import_file(db, path, fmt=None, batch_size=BATCH_SIZE):
+    fmt = fmt or ("ics" if path.lower().endswith((".ics", ".ical")) else "csv")
+    result = ImportResult()
+    batch = []
+    with open(path, newline="", encoding="utf-8-sig") as f, db.transaction() as conn:
+        for line_no, raw, parsed in READERS[fmt](f):
+            if isinstance(parsed, ValueError):
+                result.rejected.append((line_no, str(parsed), raw))
+                continue
+            batch.append(parsed)
+            if len(batch) >= batch_size:
+                conn.executemany(INSERT_SQL, batch)
+                result.imported += len(batch)
+                batch.clear()
+        if batch:
+            conn.executemany(INSERT_SQL, batch)
+            result.imported += len(batch)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import medicine reminders from a CSV or iCalendar file.")
+    parser.add_argument("path", help="CSV (name,date,time[,repeat]) or .ics file")
+    parser.add_argument("--db", default=DB_NAME, help=f"database file (default: {DB_NAME})")
+    parser.add_argument("--format", choices=sorted(READERS), help="override detection by file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rejects", help="write rejected lines to this file instead of stderr")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    db.setup()
+    started = time.perf_counter()
+    try:
+        result = import_file(db, args.path, args.format, args.batch_size)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+
+    out = open(args.rejects, "w", encoding="utf-8") if args.rejects else sys.stderr
+    try:
+        for line_no, reason, raw in result.rejected:
+            print(f"line {line_no}: {reason}: {raw}", file=out)
+    finally:
+        if args.rejects:
+            out.close()
+    print(f"{result} ({elapsed:.2f}s)")
+    return 1 if result.rejected and not result.imported else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import time
+from bisect import bisect_left
+
+
+# ----------------- REMINDER LIST MODEL -----------------
+
+class ReminderListModel:
+    """Sorted, data-driven backing store for the reminder list.
+
+    ``data`` holds one dict per reminder, ordered by (due_at, id), in the
+    shape a Kivy RecycleView expects.  It can be any mutable sequence, so the
+    Kivy frontend hands in ``RecycleView.data`` and every change below is a
+    single insert/pop/item assignment the view can apply without rebuilding.
+    Selection lives in the data as well, so recycled row widgets pick it up.
+    """
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else []
+        self._keys = []  # (due_at, id), parallel to self.data
+        self._due = {}   # id -> due_at
+        self.selected_id = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, row_id):
+        return row_id in self._due
+
+    @staticmethod
+    def _item(row_id, name, date, time_12, due_at, repeat='', start_date=None, start_time=None, selected=False):
+        # item_date/item_time show a recurring reminder's next dose;
+        # start_date/start_time keep the stored anchor the rule counts from
+        return {
+            'item_id': row_id,
+            'item_name': name,
+            'item_date': date,
+            'item_time': time_12,
+            'item_repeat': repeat,
+            'start_date': start_date if start_date is not None else date,
+            'start_time': start_time if start_time is not None else time_12,
+            'due_at': due_at if due_at is not None else 0,
+            'selected': selected,
+        }
+
+    @staticmethod
+    def _sort_key(row_id, due_at):
+        # Rows without a due time (unparseable legacy data) sort first,
+        # matching SQLite's NULLS FIRST in ORDER BY due_at.
+        return (due_at if due_at is not None else float('-inf'), row_id)
+
+    def load(self, rows):
+        """Replace the contents with ``(id, name, date, time, due_at, repeat)``
+        rows, optionally followed by the stored start date and time."""
+        entries, due = [], {}
+        for row_id, name, date, time_12, due_at, repeat, *start in rows:
+            entries.append((self._sort_key(row_id, due_at),
+                            self._item(row_id, name, date, time_12, due_at, repeat, *start,
+                                       selected=row_id == self.selected_id)))
+            due[row_id] = due_at
+        # Recurring rows are listed by their next dose, which need not follow
+        # the database order
+        entries.sort(key=lambda entry: entry[0])
+        keys = [key for key, item in entries]
+        items = [item for key, item in entries]
+        if self.selected_id not in due:
+            self.selected_id = None
+        self._keys, self._due = keys, due
+        self.data[:] = items
+
+    def get(self, row_id):
+        index = self.index_of(row_id)
+        return None if index is None else self.data[index]
+
+    def ids(self):
+        return list(self._due)
+
+    def index_of(self, row_id):
+        if row_id not in self._due:
+            return None
+        return bisect_left(self._keys, self._sort_key(row_id, self._due[row_id]))
+
+    def upsert(self, row_id, name, date, time_12, due_at, repeat='', start_date=None, start_time=None):
+        """Insert or update one row in place and return its index."""
+        item = self._item(row_id, name, date, time_12, due_at, repeat, start_date, start_time,
+                          selected=row_id == self.selected_id)
+        key = self._sort_key(row_id, due_at)
+
+        old = self.index_of(row_id)
+        if old is not None and self._keys[old] == key:
+            self.data[old] = item
+            return old
+        if old is not None:
+            del self._keys[old]
+            del self.data[old]
+
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self.data.insert(index, item)
+        self._due[row_id] = due_at
+        return index
+
+    def remove(self, row_id):
+        index = self.index_of(row_id)
+        if index is None:
+            return None
+        del self._keys[index]
+        del self.data[index]
+        del self._due[row_id]
+        if self.selected_id == row_id:
+            self.selected_id = None
+        return index
+
+    def select(self, row_id):
+        """Mark ``row_id`` as selected (``None`` clears) and return its item."""
+        self._set_selected(self.selected_id, False)
+        self.selected_id = row_id if row_id in self._due else None
+        return self._set_selected(self.selected_id, True)
+
+    def _set_selected(self, row_id, selected):
+        index = self.index_of(row_id)
+        if index is None:
+            return None
+        item = dict(self.data[index], selected=selected)
+        self.data[index] = item
+        return item
+
+
+
+# ----------------- PAGED WINDOW -----------------
+
+class ReminderPager:
+    """Keyset-paginated window over the medicines table.
+
+    The list starts at the next upcoming dose instead of the oldest row ever
+    entered; earlier and later one-off reminders are fetched a page at a time
+    as the user scrolls.  At most ``max_rows`` one-off rows are held: loading
+    a page at one end drops rows from the other, so memory and per-page cost
+    stay flat however much history the table holds.  Recurring reminders are
+    few and always listed (by their next dose, see recurrence.list_row).
+
+    The pager only tracks the window; callers put the returned rows into
+    their list and remove the dropped ids.  ``db`` is a Database or anything
+    with the same ``page_medicines``/``recurring_medicines`` (ReminderStore).
+    """
+
+    PAGE_SIZE = 200
+    MAX_ROWS = 1000
+
+    def __init__(self, db, page_size=PAGE_SIZE, max_rows=MAX_ROWS):
+        self.db = db
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self._keys = []   # (due_at, id) of loaded one-off rows, sorted
+        self._due = {}    # id -> due_at for the same rows
+        self._low = None  # window bounds; None means open-ended
+        self._high = None
+
+    @property
+    def has_older(self):
+        return self._low is not None
+
+    @property
+    def has_later(self):
+        return self._high is not None
+
+    def first_page(self, now=None):
+        """Recurring rows plus the first page of upcoming one-off rows."""
+        self._keys, self._due = [], {}
+        self._low = (int(time.time() if now is None else now), -1)
+        rows = self.db.page_medicines(after=self._low, limit=self.page_size)
+        self._add(rows)
+        self._high = self._keys[-1] if len(rows) == self.page_size else None
+        return self.db.recurring_medicines() + rows
+
+    def older_page(self):
+        """Return ``(rows, dropped_ids)`` for the page before the window."""
+        if self._low is None:
+            return [], []
+        rows = self.db.page_medicines(before=self._low, limit=self.page_size)
+        self._add(rows)
+        self._low = self._keys[0] if len(rows) == self.page_size else None
+        dropped = self._trim(from_start=False)
+        return rows, dropped
+
+    def later_page(self):
+        """Return ``(rows, dropped_ids)`` for the page after the window."""
+        if self._high is None:
+            return [], []
+        rows = self.db.page_medicines(after=self._high, limit=self.page_size)
+        self._add(rows)
+        self._high = self._keys[-1] if len(rows) == self.page_size else None
+        dropped = self._trim(from_start=True)
+        return rows, dropped
+
+    def track(self, row_id, due_at, rule=None):
+        """Record a locally written row; returns whether the list should show it."""
+        self.forget(row_id)
+        if rule:
+            return True
+        if due_at is None:
+            return False
+        key = (due_at, row_id)
+        if (self._low is not None and key < self._low) or (self._high is not None and key > self._high):
+            return False
+        self._add([(row_id, None, None, None, due_at, None)])
+        return True
+
+    def forget(self, row_id):
+        due_at = self._due.pop(row_id, None)
+        if due_at is not None:
+            del self._keys[bisect_left(self._keys, (due_at, row_id))]
+
+    def _add(self, rows):
+        for row in rows:
+            key = (row[4], row[0])
+            self._keys.insert(bisect_left(self._keys, key), key)
+            self._due[row[0]] = row[4]
+
+    def _trim(self, from_start):
+        excess = len(self._keys) - self.max_rows
+        if excess <= 0:
+            return []
+        if from_start:
+            dropped, self._keys = self._keys[:excess], self._keys[excess:]
+            self._low = self._keys[0]
+        else:
+            dropped, self._keys = self._keys[-excess:], self._keys[:-excess]
+            self._high = self._keys[-1]
+        for due_at, row_id in dropped:
+            del self._due[row_id]
+        return [row_id for due_at, row_id in dropped]
@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+
+from stats import timed
+
+# ----------------- NOTIFICATION BACKENDS -----------------
+# A backend is anything with a `name` and a `send(title, message)` method
+# that raises on failure.  Tests and headless runs can pass their own.  A
+# backend may set `call_timeout` to bound its own send() calls instead of
+# the dispatcher's default.
+
+
+class PlyerBackend:
+    name = "plyer"
+
+    def __init__(self, display_seconds=10, call_timeout=15):
+        self.display_seconds = display_seconds  # how long the notification stays on screen
+        # Some platforms block in notify() while the notification is shown,
+        # so a send may take longer than display_seconds
+        self.call_timeout = call_timeout
+        self._notification = None
+
+    def send(self, title, message):
+        if self._notification is None:
+            # Imported on first use: plyer pulls in platform modules that are
+            # slow to load and not needed until a dose is actually due.
+            from plyer import notification
+            self._notification = notification
+        self._notification.notify(title=title, message=message, timeout=self.display_seconds)
+
+
+class ConsoleBackend:
+    name = "console"
+
+    def send(self, title, message):
+        print(f"{title}: {message}")
+
+
+class MemoryBackend:
+    """Collects notifications in a list; a local stand-in for tests."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, title, message):
+        self.sent.append((title, message))
+
+
+# ----------------- DISPATCH QUEUE -----------------
+
+class NotificationDispatcher:
+    """Delivers reminder notifications off the scheduler thread.
+
+    ``submit()`` only enqueues.  A collector thread groups doses due in the
+    same minute, waits ``linger`` seconds for stragglers, and hands each group
+    to a pool of worker threads as one notification.  Once a group has been
+    delivered, each dose's ``on_delivered()`` callback (if any) is called.
+    Workers try the backends in order, each call bounded by the backend's
+    ``call_timeout`` (default ``timeout``) and retried ``retries`` times with
+    exponential backoff before falling through to the next backend.
+    """
+
+    def __init__(self, backends, title="Medicine Reminder", workers=2, linger=0.5,
+                 timeout=10, retries=2, retry_delay=1.0):
+        self.backends = list(backends)
+        self.title = title
+        self.linger = linger
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.workers = workers
+
+        self._incoming = queue.Queue()
+        self._work = queue.Queue()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+
+    def start(self):
+        threads = [threading.Thread(target=self._collect, daemon=True)]
+        threads += [threading.Thread(target=self._deliver_loop, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+        return self
+
+    def stop(self):
+        self._incoming.put(None)
+
+    def submit(self, medicine_name, due_at=None, on_delivered=None):
+        due_at = time.time() if due_at is None else due_at
+        self._incoming.put((int(due_at // 60), medicine_name, on_delivered))
+
+    @staticmethod
+    def format_message(names):
+        if len(names) == 1:
+            return f"Time to take your medicine: {names[0]}"
+        return f"Time to take your medicines ({len(names)}): " + ", ".join(names)
+
+    # ----------------- collector -----------------
+
+    def _collect(self):
+        groups = {}    # due minute -> names
+        deadlines = {}  # due minute -> monotonic flush time
+        while True:
+            timeout = None
+            if deadlines:
+                timeout = max(min(deadlines.values()) - time.monotonic(), 0)
+            try:
+                item = self._incoming.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                for minute in list(groups):
+                    self._work.put(groups.pop(minute))
+                for _ in range(self.workers):
+                    self._work.put(None)
+                return
+            if item:
+                minute, name, on_delivered = item
+                if minute not in groups:
+                    groups[minute] = []
+                    deadlines[minute] = time.monotonic() + self.linger
+                groups[minute].append((name, on_delivered))
+
+            now = time.monotonic()
+            for minute, deadline in list(deadlines.items()):
+                if deadline <= now:
+                    del deadlines[minute]
+                    self._work.put(groups.pop(minute))
+
+    # ----------------- workers -----------------
+
+    def _deliver_loop(self):
+        while True:
+            group = self._work.get()
+            if group is None:
+                return
+            ok = self.deliver([name for name, on_delivered in group])
+            with self._stats_lock:
+                if ok:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+            if not ok:
+                continue
+            for name, on_delivered in group:
+                if on_delivered is None:
+                    continue
+                try:
+                    on_delivered()
+                except Exception as e:
+                    print(f"Error recording delivery of {name}: {e}")
+
+    @timed("notify.deliver")
+    def deliver(self, names):
+        message = self.format_message(names)
+        for backend in self.backends:
+            delay = self.retry_delay
+            for attempt in range(self.retries + 1):
+                try:
+                    _call_with_timeout(backend.send, (self.title, message),
+                                       getattr(backend, "call_timeout", self.timeout))
+                    return True
+                except Exception as e:
+                    print(f"Error sending notification via {backend.name} (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(delay)
+                    delay *= 2
+        return False
+
+
+def _call_with_timeout(func, args, timeout):
+    # A hung backend call is abandoned on a daemon thread so the worker can
+    # move on; the thread ends whenever the call eventually returns.
+    result = {}
+
+    def run():
+        try:
+            func(*args)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"no response within {timeout}s")
+    if "error" in result:
+        raise result["error"]
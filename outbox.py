@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from functools import partial
+
+from recurrence import Recurrence
+from stats import timer
+
+# ----------------- NOTIFICATION OUTBOX -----------------
+# A fired reminder is written to notification_outbox before it goes to the
+# dispatcher, and is marked delivered once a backend has accepted it.
+# Each hand-off is recorded in attempted_at/attempts.  Anything left
+# undelivered is sent again RETRY_AFTER seconds after its last attempt, and
+# the wait doubles with every further attempt (up to MAX_BACKOFF_STEPS
+# doublings).  That covers every backend failing, the app being closed or
+# crashing mid-way (picked up on the next start), and the machine sleeping.
+# An entry still queued in the dispatcher is not sent a second time.
+# Doses that came due while the app was not running at all are found with one
+# range query on due_at, plus the recurring rules, and fired late, provided
+# they fall inside the replay window.
+#
+# MEDICINE_REMINDER_REPLAY_MINUTES sets that window (default 120).  Delivery
+# is at-least-once: a crash between delivery and the delivered mark sends the
+# dose again on the next start.
+
+REPLAY_GRACE_MINUTES = int(os.environ.get("MEDICINE_REMINDER_REPLAY_MINUTES", "120"))
+RETRY_AFTER = 300
+MAX_BACKOFF_STEPS = 4  # retry waits 5, 10, 20, 40, then 80 minutes
+
+
+class NotificationOutbox:
+    """Durable hand-off from the scheduler to the NotificationDispatcher.
+
+    ``send()`` records a fired dose, then submits it.  ``replay()`` submits
+    again whatever never got delivered.  It passes doses that were missed
+    entirely to ``on_missed(medicine_id, name, due_at)``, which is the app's
+    own due handler, so they are claimed and logged like any other dose.
+    """
+
+    def __init__(self, db, dispatcher, on_missed=None, grace=REPLAY_GRACE_MINUTES * 60, check_interval=30,
+                 retry_after=RETRY_AFTER):
+        self.db = db
+        self.dispatcher = dispatcher
+        self.on_missed = on_missed
+        self.grace = grace
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self._batch_at = None  # set while replaying: everything goes out as one notification
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def send(self, medicine_id, name, due_at):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO notification_outbox (medicine_id, name, due_at, created_at) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (medicine_id, due_at) DO NOTHING", (medicine_id, name, due_at, int(time.time())))
+            entry_id, delivered_at = conn.execute(
+                "SELECT id, delivered_at FROM notification_outbox WHERE medicine_id = ? AND due_at = ?",
+                (medicine_id, due_at)).fetchone()
+        if delivered_at is None:
+            self._submit([(entry_id, name)], int(time.time()))
+
+    def _submit(self, entries, now):
+        with self.db.transaction() as conn:
+            conn.executemany("UPDATE notification_outbox SET attempted_at = ?, attempts = attempts + 1 WHERE id = ?",
+                             [(now, entry_id) for entry_id, name in entries])
+        for entry_id, name in entries:
+            self.dispatcher.submit(name, self._batch_at, on_delivered=partial(self.delivered, entry_id))
+
+    def delivered(self, entry_id):
+        self.db.execute("UPDATE notification_outbox SET delivered_at = ? WHERE id = ?", (int(time.time()), entry_id))
+
+    # ----------------- replay -----------------
+
+    def replay(self, now=None, missed=True):
+        """Send undelivered doses whose retry wait has passed, and (with
+        ``missed``) doses that never fired, due within the grace window.
+        Returns how many were sent."""
+        now = int(time.time()) if now is None else now
+        since = now - self.grace
+        with timer("outbox.replay") as t:
+            pending = self.db.query("""
+            SELECT id, name FROM notification_outbox
+            WHERE due_at >= ? AND delivered_at IS NULL
+              AND (attempted_at IS NULL OR attempted_at + ? * (1 << MIN(MAX(attempts - 1, 0), ?)) <= ?)
+            ORDER BY due_at
+            """, (since, self.retry_after, MAX_BACKOFF_STEPS, now))
+            doses = self._missed(since, now) if missed and self.on_missed is not None else []
+            self._batch_at = now
+            try:
+                if pending:
+                    self._submit(pending, now)
+                for dose in doses:
+                    self.on_missed(*dose)
+            finally:
+                self._batch_at = None
+            t.rows = len(pending) + len(doses)
+        return len(pending) + len(doses)
+
+    def _missed(self, since, now):
+        # The due_at index covers one-off doses; recurring rules are few and
+        # expanded over the window only
+        seen = set(self.db.query("SELECT medicine_id, due_at FROM notification_outbox WHERE due_at >= ?", (since,)))
+        rows = self.db.query("""
+        SELECT id, name, due_at, rule FROM medicines WHERE due_at >= ? AND due_at < ? AND rule IS NULL
+        UNION ALL
+        SELECT id, name, due_at, rule FROM medicines WHERE rule IS NOT NULL
+        """, (since, now))
+        doses = []
+        for row_id, name, due_at, rule in rows:
+            if due_at is None:
+                continue
+            recurrence = Recurrence.parse(rule)
+            times = [due_at] if recurrence is None else recurrence.between(due_at, since, now)
+            doses.extend((row_id, name, at) for at in times if (row_id, at) not in seen)
+        doses.sort(key=lambda dose: dose[2])
+        return doses
+
+    # ----------------- background job -----------------
+
+    def start(self):
+        """Replay once now, then every ``check_interval`` seconds retry
+        deliveries whose wait has passed, and after a wake from sleep also
+        look for missed doses."""
+        def run():
+            self._replay_safely()
+            last = time.time()
+            while not self._stopped.wait(self.check_interval):
+                now = time.time()
+                # The wait ran far longer on the wall clock: the machine slept
+                # (or the clock jumped), so doses may have been missed
+                woke = now - last > 2 * self.check_interval
+                last = now
+                self._replay_safely(missed=woke)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _replay_safely(self, **kwargs):
+        try:
+            sent = self.replay(**kwargs)
+            if sent:
+                print(f"Replayed {sent} undelivered or missed reminders")
+        except Exception as e:
+            print(f"Outbox replay error: {e}")
+
+    def stop(self):
+        self._stopped.set()
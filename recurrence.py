@@ -0,0 +1,246 @@
+import re
+from functools import partial
+from datetime import datetime, timedelta
+
+# ----------------- RECURRENCE RULES -----------------
+# A recurring reminder is stored once: its medicines row holds the first dose
+# (date/time/due_at) and a `rule` column with an iCalendar RRULE subset, e.g.
+#   FREQ=DAILY;INTERVAL=1
+#   FREQ=HOURLY;INTERVAL=8;COUNT=21
+#   FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=2025-12-31
+# Doses are never materialized; they are generated on demand for the window
+# a caller asks for.
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+FREQUENCIES = ("HOURLY", "DAILY", "WEEKLY")
+
+_DAY_NAMES = {name: i for i, names in enumerate([
+    ("mo", "mon", "monday"), ("tu", "tue", "tues", "tuesday"), ("we", "wed", "wednesday"),
+    ("th", "thu", "thur", "thurs", "thursday"), ("fr", "fri", "friday"),
+    ("sa", "sat", "saturday"), ("su", "sun", "sunday"),
+]) for name in names}
+
+_DAY = "(?:" + "|".join(sorted(_DAY_NAMES, key=len, reverse=True)) + ")"
+# The whole Repeat field must match; words outside this grammar are an error
+# rather than skipped, so "3 times daily" is not read as a 3-dose rule
+_REPEAT_RE = re.compile(
+    r"(?:(?P<simple>hourly|daily|weekly)|every(?:\s+(?P<interval>\d+))?\s+(?P<unit>hour|day|week)s?)?"
+    rf"(?:\s*(?:\bon\s+)?(?P<days>\b{_DAY}(?:(?:\s*,\s*|\s+and\s+|\s+){_DAY})*)\b)?"
+    r"(?:\s*\buntil\s+(?P<until>\d{4}-\d{2}-\d{2}))?"
+    r"(?:\s*,?\s*(?:\bfor\s+)?\b(?P<count>\d+)\s*(?:times?|doses?))?"
+)
+_DAY_RE = re.compile(rf"\b{_DAY}\b")
+_PER_DAY_RE = re.compile(r"\b(?:\d+\s+times|once|twice|thrice)\s+(?:daily|a\s+day|per\s+day)\b")
+
+
+class Recurrence:
+    def __init__(self, freq, interval=1, weekdays=None, until=None, count=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {freq}")
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("Interval and count must be positive.")
+        self.freq = freq
+        self.interval = interval
+        self.weekdays = sorted(set(weekdays)) if weekdays else None
+        self.until = until  # datetime.date, inclusive
+        self.count = count
+
+    # ----------------- parsing / formatting -----------------
+
+    @classmethod
+    def parse(cls, rule):
+        """Parse the stored RRULE subset (``None``/empty means one-off)."""
+        if not rule:
+            return None
+        parts = dict(part.split("=", 1) for part in rule.upper().split(";") if part)
+        weekdays = None
+        if "BYDAY" in parts:
+            weekdays = [WEEKDAYS.index(day) for day in parts["BYDAY"].split(",")]
+        until = None
+        if "UNTIL" in parts:
+            # Accepts 2025-12-31 as well as iCalendar's 20251231[T235959Z]
+            until = datetime.strptime(parts["UNTIL"].replace("-", "")[:8], "%Y%m%d").date()
+        return cls(
+            parts.get("FREQ", ""),
+            interval=int(parts.get("INTERVAL", 1)),
+            weekdays=weekdays,
+            until=until,
+            count=int(parts["COUNT"]) if "COUNT" in parts else None,
+        )
+
+    @classmethod
+    def from_text(cls, text):
+        """Parse what a user types in the Repeat field.
+
+        Accepts e.g. "daily", "every 8 hours", "every 2 days", "mon, wed, fri",
+        "weekly on tue until 2025-06-30", "every 12 hours for 14 doses", what
+        describe() returns, or a raw RRULE.  Blank or "once" means no
+        recurrence.  Anything else, such as "twice daily" or "for 3 days",
+        raises ValueError.
+        """
+        text = (text or "").strip().lower()
+        if text in ("", "once", "none", "no"):
+            return None
+        if "freq=" in text:
+            return cls.parse(text)
+
+        match = _REPEAT_RE.fullmatch(re.sub(r"\s+", " ", text))
+        if not match or not (match.group("simple") or match.group("unit") or match.group("days")):
+            if _PER_DAY_RE.search(text):
+                raise ValueError(f"Could not understand repeat rule: {text!r}; "
+                                 "give the spacing instead, e.g. 'every 8 hours'")
+            raise ValueError(f"Could not understand repeat rule: {text!r}")
+
+        until = datetime.strptime(match.group("until"), "%Y-%m-%d").date() if match.group("until") else None
+        count = int(match.group("count")) if match.group("count") else None
+        weekdays = [_DAY_NAMES[day] for day in _DAY_RE.findall(match.group("days") or "")] or None
+        if match.group("unit"):
+            freq = {"hour": "HOURLY", "day": "DAILY", "week": "WEEKLY"}[match.group("unit")]
+            interval = int(match.group("interval") or 1)
+        elif match.group("simple"):
+            freq, interval = match.group("simple").upper(), 1
+        else:
+            freq, interval = "WEEKLY", 1
+        if weekdays and freq != "WEEKLY":
+            raise ValueError("Weekdays can only be combined with a weekly repeat.")
+        return cls(freq, interval=interval, weekdays=weekdays, until=until, count=count)
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.weekdays:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in self.weekdays))
+        if self.until:
+            parts.append(f"UNTIL={self.until.isoformat()}")
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+    def describe(self):
+        unit = {"HOURLY": "hour", "DAILY": "day", "WEEKLY": "week"}[self.freq]
+        text = f"every {unit}" if self.interval == 1 else f"every {self.interval} {unit}s"
+        if self.weekdays:
+            text += " on " + ",".join(WEEKDAYS[day].title() for day in self.weekdays)
+        if self.until:
+            text += f" until {self.until.isoformat()}"
+        if self.count:
+            text += f", {self.count} doses"
+        return text
+
+    # ----------------- lazy expansion -----------------
+
+    def occurrences(self, start, after=None):
+        """Yield dose times (epoch seconds) for a rule anchored at ``start``.
+
+        Only doses strictly later than ``after`` are produced; the generator
+        jumps straight to the first one instead of walking from ``start``, so
+        asking for next week's doses of a years-old rule is O(1) to begin.
+        """
+        if self.freq == "HOURLY":
+            yield from self._hourly(start, after)
+        elif self.freq == "DAILY":
+            yield from self._daily(start, after)
+        else:
+            yield from self._weekly(start, after)
+
+    def between(self, start, window_start, window_end):
+        """Doses in ``[window_start, window_end)``."""
+        for due_at in self.occurrences(start, window_start - 1):
+            if due_at >= window_end:
+                return
+            yield due_at
+
+    def next_after(self, start, after):
+        return next(self.occurrences(start, after), None)
+
+    def _within_until(self, due_at):
+        return self.until is None or datetime.fromtimestamp(due_at).date() <= self.until
+
+    def _hourly(self, start, after):
+        step = self.interval * 3600
+        k = 0 if after is None or after < start else (after - start) // step + 1
+        while self.count is None or k < self.count:
+            due_at = start + k * step
+            if not self._within_until(due_at):
+                return
+            yield due_at
+            k += 1
+
+    def _daily(self, start, after):
+        # Days are stepped in local wall-clock time so doses stay at the same
+        # time of day across DST changes.
+        start_dt = datetime.fromtimestamp(start)
+        k = 0
+        if after is not None and after >= start:
+            k = max((datetime.fromtimestamp(after).date() - start_dt.date()).days // self.interval, 0)
+        while self.count is None or k < self.count:
+            due_at = int((start_dt + timedelta(days=k * self.interval)).timestamp())
+            if not self._within_until(due_at):
+                return
+            if after is None or due_at > after:
+                yield due_at
+            k += 1
+
+    def _weekly(self, start, after):
+        start_dt = datetime.fromtimestamp(start)
+        weekdays = self.weekdays or [start_dt.weekday()]
+        week_start = start_dt - timedelta(days=start_dt.weekday())
+        first_week = [day for day in weekdays if day >= start_dt.weekday()]
+
+        week = 0
+        if after is not None and after >= start:
+            elapsed_days = (datetime.fromtimestamp(after).date() - week_start.date()).days
+            week = max(elapsed_days // 7 // self.interval, 0)
+        # Number of doses before `week`, needed for COUNT
+        index = 0 if week == 0 else len(first_week) + (week - 1) * len(weekdays)
+
+        while True:
+            days = first_week if week == 0 else weekdays
+            for day in days:
+                if self.count is not None and index >= self.count:
+                    return
+                due_at = int((week_start + timedelta(days=week * self.interval * 7 + day)).timestamp())
+                if not self._within_until(due_at):
+                    return
+                index += 1
+                if after is None or due_at > after:
+                    yield due_at
+            week += 1
+
+
+# ----------------- HELPERS -----------------
+
+def list_row(row, now):
+    """List-view row for a reminder, showing a recurring one's next dose.
+
+    ``row`` is ``(id, name, date, time, due_at, rule)``; the result has the
+    rule replaced by a short description ("" for one-off reminders), followed
+    by the stored date and time, which is what the edit form shows.
+    """
+    row_id, name, date, time_12, due_at, rule = row
+    recurrence = Recurrence.parse(rule)
+    if recurrence is None or due_at is None:
+        return row_id, name, date, time_12, due_at, "", date, time_12
+    start_date, start_time = date, time_12
+    upcoming = recurrence.next_after(due_at, now - 1)
+    if upcoming is not None:
+        dose = datetime.fromtimestamp(upcoming)
+        date, time_12, due_at = dose.strftime("%Y-%m-%d"), dose.strftime("%I:%M %p"), upcoming
+    return row_id, name, date, time_12, due_at, recurrence.describe(), start_date, start_time
+
+
+def scheduler_entries(rows, since):
+    """Turn ``(id, due_at, name, rule)`` rows into ReminderScheduler entries.
+
+    Recurring reminders get one heap entry for their next dose plus a
+    ``repeat`` callable the scheduler uses to requeue the following one.
+    """
+    for row_id, due_at, name, rule in rows:
+        recurrence = Recurrence.parse(rule)
+        if recurrence is None:
+            yield row_id, due_at, name, None
+            continue
+        upcoming = recurrence.next_after(due_at, since - 1)
+        if upcoming is not None:
+            yield row_id, upcoming, name, partial(recurrence.next_after, due_at)
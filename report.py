@@ -0,0 +1,205 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from doselog import EVENTS
+from stats import timer
+
+# ----------------- ADHERENCE REPORT -----------------
+# Adherence rate, lateness and streaks per medicine over long dose
+# histories, for one or many patient databases:
+#
+#   python report.py medicine_reminder.db --output report.csv
+#   python report.py /var/lib/reminders/*.db --days 365 --output report.json
+#
+# dose_events is streamed out of SQLite in chunks and folded into NumPy
+# accumulators, so memory depends on the number of medicines and days
+# covered, not on the number of events.  SQLite packs each event into one
+# integer (see PACKED_SQL): fetching a single column halves the time spent
+# building Python rows, which dominates the run.
+#
+# Patient databases are opened read-only and never migrated or pruned here;
+# one older than DOSE_LOG_VERSION has no dose history and is skipped.
+
+CHUNK_SIZE = 200_000
+DOSE_LOG_VERSION = 6  # schema version that added dose_events and dose_totals
+MAX_LATE_MINUTES = 24 * 60  # lateness range; later doses count as a day late
+
+FIELDS = ["patient", "medicine_id", "name", *EVENTS, "adherence_pct", "avg_late_min", "median_late_min",
+          "longest_streak_days", "current_streak_days"]
+
+_EVENT_SQL = "CASE event " + " ".join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(EVENTS)) + " END"
+NOTIFIED, TAKEN = EVENTS.index("notified"), EVENTS.index("taken")
+
+# medicine_id << 34 | day << 20 | event << 17 | lateness in seconds
+LATE_BITS, EVENT_BITS, DAY_BITS = 17, 3, 14
+PACKED_SQL = f"""
+SELECT (medicine_id << {DAY_BITS + EVENT_BITS + LATE_BITS})
+     | (((due_at + :offset) / 86400 - :first_day) << {EVENT_BITS + LATE_BITS})
+     | (({_EVENT_SQL}) << {LATE_BITS})
+     | MIN(MAX(at - due_at, 0), {MAX_LATE_MINUTES * 60})
+FROM dose_events WHERE due_at >= :since AND due_at <= :until
+"""
+
+
+class PatientReport:
+    """Per-medicine accumulators for one patient database."""
+
+    def __init__(self, days):
+        self.days = days
+        self.ids = {}  # medicine id -> row in the arrays below
+        self.counts = np.zeros((0, len(EVENTS)), dtype=np.int64)
+        self.late_sum = np.zeros(0, dtype=np.int64)
+        self.late_hist = np.zeros((0, MAX_LATE_MINUTES + 1), dtype=np.int64)
+        self.daily = np.zeros((0, 2, days), dtype=np.int32)  # notified / taken per day
+
+    def _rows_for(self, medicine_ids):
+        unique, inverse = np.unique(medicine_ids, return_inverse=True)
+        new = [int(medicine_id) for medicine_id in unique if int(medicine_id) not in self.ids]
+        if new:
+            for medicine_id in new:
+                self.ids[medicine_id] = len(self.ids)
+            grow = len(new)
+            self.counts = np.vstack([self.counts, np.zeros((grow, len(EVENTS)), dtype=np.int64)])
+            self.late_sum = np.concatenate([self.late_sum, np.zeros(grow, dtype=np.int64)])
+            self.late_hist = np.vstack([self.late_hist, np.zeros((grow, MAX_LATE_MINUTES + 1), dtype=np.int64)])
+            self.daily = np.concatenate([self.daily, np.zeros((grow, 2, self.days), dtype=np.int32)])
+        index = np.fromiter((self.ids[int(medicine_id)] for medicine_id in unique), dtype=np.int64,
+                            count=len(unique))
+        return index[inverse]
+
+    def add(self, packed):
+        """Fold an array of PACKED_SQL values into the totals."""
+        late = packed & ((1 << LATE_BITS) - 1)
+        event = (packed >> LATE_BITS) & ((1 << EVENT_BITS) - 1)
+        day = (packed >> (EVENT_BITS + LATE_BITS)) & ((1 << DAY_BITS) - 1)
+        rows = self._rows_for(packed >> (DAY_BITS + EVENT_BITS + LATE_BITS))
+        n = len(self.ids)
+
+        self.counts += np.bincount(rows * len(EVENTS) + event, minlength=n * len(EVENTS)).reshape(n, -1)
+
+        taken = event == TAKEN
+        late_minutes = late[taken] // 60
+        self.late_sum += np.bincount(rows[taken], weights=late[taken], minlength=n).astype(np.int64)
+        self.late_hist += np.bincount(rows[taken] * (MAX_LATE_MINUTES + 1) + late_minutes,
+                                      minlength=n * (MAX_LATE_MINUTES + 1)).reshape(n, -1)
+
+        in_range = (day < self.days) & ((event == NOTIFIED) | taken)
+        flat = (rows[in_range] * 2 + taken[in_range]) * self.days + day[in_range]
+        self.daily += np.bincount(flat, minlength=n * 2 * self.days).reshape(n, 2, self.days).astype(np.int32)
+
+    def summary(self):
+        """Column arrays for every medicine seen, in FIELDS order (minus patient/name)."""
+        notified, taken = self.counts[:, NOTIFIED], self.counts[:, TAKEN]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            adherence = np.where(notified > 0, np.minimum(taken / notified, 1.0) * 100, np.nan)
+            avg_late = np.where(taken > 0, self.late_sum / taken / 60, np.nan)
+
+        # Median lateness from the per-minute histogram
+        cumulative = np.cumsum(self.late_hist, axis=1)
+        median_late = np.argmax(cumulative * 2 >= cumulative[:, -1:], axis=1).astype(float)
+        median_late[taken == 0] = np.nan
+
+        # A day counts towards a streak when every notified dose was taken;
+        # days without doses neither extend nor break it.
+        day_notified, day_taken = self.daily[:, 0], self.daily[:, 1]
+        kept = (day_notified > 0) & (day_taken >= day_notified)
+        broken = (day_notified > 0) & ~kept
+        run_total = np.cumsum(kept, axis=1)
+        at_last_break = np.maximum.accumulate(np.where(broken, run_total, 0), axis=1)
+        streak = run_total - at_last_break
+        longest = streak.max(axis=1) if self.days else np.zeros(len(self.ids), dtype=np.int64)
+        current = streak[:, -1] if self.days else longest
+
+        ids = np.fromiter(self.ids, dtype=np.int64, count=len(self.ids))
+        return ids, self.counts, adherence, avg_late, median_late, longest, current
+
+
+def report_database(path, since, until):
+    """Rows (dicts keyed by FIELDS) for one patient database."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Skipping {path}: {e}")
+        return []
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < DOSE_LOG_VERSION:
+            print(f"Skipping {path}: schema version {version} has no dose history")
+            return []
+        offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+        first_day, last_day = int((since + offset) // 86400), int((until + offset) // 86400)
+        accumulator = PatientReport(last_day - first_day + 1)
+
+        cursor = conn.execute(PACKED_SQL, {"offset": offset, "first_day": first_day, "since": since,
+                                           "until": until})
+        for rows in iter(lambda: cursor.fetchmany(CHUNK_SIZE), []):
+            with timer("report.chunk") as t:
+                t.rows = len(rows)
+                accumulator.add(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+
+        names = dict(conn.execute("SELECT medicine_id, name FROM dose_totals"))
+    finally:
+        conn.close()
+
+    patient = os.path.splitext(os.path.basename(path))[0]
+    ids, counts, adherence, avg_late, median_late, longest, current = accumulator.summary()
+    order = np.argsort(ids)
+    return [{
+        "patient": patient,
+        "medicine_id": int(ids[i]),
+        "name": names.get(int(ids[i]), ""),
+        **{name: int(counts[i, code]) for code, name in enumerate(EVENTS)},
+        "adherence_pct": _round(adherence[i]),
+        "avg_late_min": _round(avg_late[i]),
+        "median_late_min": _round(median_late[i]),
+        "longest_streak_days": int(longest[i]),
+        "current_streak_days": int(current[i]),
+    } for i in order]
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def write_report(rows, output):
+    if output.lower().endswith(".json"):
+        with open(output, "w") as f:
+            json.dump(rows, f, indent=1)
+        return
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adherence, lateness and streak report from dose history.")
+    parser.add_argument("databases", nargs="+", help="one database per patient")
+    parser.add_argument("--days", type=int, default=365, help="history to cover (default: 365)")
+    parser.add_argument("--output", default="adherence_report.csv", help="CSV or .json summary file")
+    args = parser.parse_args(argv)
+    if not 0 < args.days < 1 << DAY_BITS:
+        parser.error(f"--days must be between 1 and {(1 << DAY_BITS) - 1}")
+
+    until = int(time.time())
+    since = until - args.days * 86400
+    started = time.perf_counter()
+    rows = []
+    for path in args.databases:
+        rows.extend(report_database(path, since, until))
+    write_report(rows, args.output)
+    print(f"Wrote {len(rows)} rows for {len(args.databases)} patients to {args.output} "
+          f"({time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import threading
+import time
+
+from stats import timer
+
+
+# ----------------- NEXT-DUE SCHEDULER -----------------
+
+class ReminderScheduler:
+    """Keeps upcoming reminders in a heap and sleeps until the earliest one.
+
+    ``on_due(key, payload, due_at)`` is called from the scheduler thread when
+    a reminder comes due, with the due time it was scheduled for.  ``load()``
+    may return ``(key, due_at, payload)`` or ``(key, due_at, payload,
+    repeat)`` tuples and is called once when the thread starts.
+    Add/update/delete paths call ``schedule()`` / ``cancel()``, which wake
+    the thread so the next sleep is recomputed.
+
+    A recurring reminder keeps a single heap entry: ``repeat(after)`` returns
+    its next due time after ``after`` (or ``None`` when the rule has ended)
+    and the entry is requeued as soon as it fires.
+
+    ``on_next(entry)`` is called from the scheduler thread whenever the
+    earliest reminder changes, with ``(due_at, key, payload)`` or ``None``
+    when nothing is scheduled.  It runs with the scheduler locked, so it
+    must only hand the value on (e.g. put it on a queue).
+    """
+
+    # Longest single sleep. Condition.wait() runs on the monotonic clock, so
+    # a wall-clock jump (suspend, NTP) is noticed at most this late.
+    MAX_WAIT = 300
+
+    def __init__(self, on_due, load=None, grace=60, on_next=None):
+        self.on_due = on_due
+        self.load = load
+        self.on_next = on_next
+        self._next = None  # last entry passed to on_next
+        # Reminders due more than `grace` seconds ago are never fired
+        self.grace = grace
+
+        self._heap = []
+        self._live = {}  # key -> sequence number of its current heap entry
+        # key -> due time last fired; reloading a source cannot refire a dose
+        # that already went out (entries older than `grace` are pruned)
+        self._fired = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def schedule(self, key, due_at, payload=None, repeat=None):
+        with self._cond:
+            self._push(key, due_at, payload, repeat)
+            self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            if self._live.pop(key, None) is not None:
+                self._compact()
+                self._cond.notify()
+
+    def next_due(self):
+        with self._cond:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._live)
+
+    # ----------------- internals (caller holds self._cond) -----------------
+
+    def _push(self, key, due_at, payload, repeat=None):
+        cutoff = time.time() - self.grace
+        if due_at is not None and due_at < cutoff and repeat is not None:
+            due_at = repeat(cutoff)
+        fired = self._fired.get(key)
+        if due_at is not None and fired is not None and due_at <= fired:
+            due_at = repeat(fired) if repeat is not None else None
+        if due_at is None or due_at < cutoff:
+            # Too old to fire; make sure an earlier entry doesn't fire either
+            self._live.pop(key, None)
+            return
+        seq = next(self._seq)
+        self._live[key] = seq
+        heapq.heappush(self._heap, (due_at, seq, key, payload, repeat))
+        self._compact()
+
+    def _discard_stale(self):
+        heap = self._heap
+        while heap and self._live.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        # Updates and cancels leave stale entries behind (lazy deletion);
+        # rebuild once they outnumber the live ones.
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._live):
+            self._heap = [e for e in self._heap if self._live.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        due = []
+        cutoff = now - self.grace
+        # self._heap is re-read each pass: requeuing may compact it
+        while self._heap and self._heap[0][0] <= now:
+            due_at, seq, key, payload, repeat = heapq.heappop(self._heap)
+            if self._live.get(key) == seq:
+                del self._live[key]
+                if due_at < cutoff:
+                    # Woke up too late (suspend, long stall) to announce it
+                    # now; late doses are left to the outbox replay
+                    if repeat is not None:
+                        self._push(key, repeat(due_at), payload, repeat)
+                    continue
+                self._fired[key] = due_at
+                due.append((key, payload, due_at))
+                if repeat is not None:
+                    self._push(key, repeat(due_at), payload, repeat)
+        if len(self._fired) > 1024:
+            cutoff = now - self.grace
+            self._fired = {key: at for key, at in self._fired.items() if at >= cutoff}
+        return due
+
+    def _announce_next(self):
+        head = self._heap[0] if self._heap else None
+        entry = head and (head[0], head[2], head[3])
+        if self.on_next is not None and entry != self._next:
+            self._next = entry
+            try:
+                self.on_next(entry)
+            except Exception as e:
+                print(f"Error announcing next reminder: {e}")
+
+    def _run(self):
+        if self.load is not None:
+            entries = self.load()
+            with self._cond:
+                for entry in entries:
+                    self._push(*entry)
+
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.time()
+                with timer("scheduler.tick") as t:
+                    due = self._pop_due(now)
+                    t.rows = len(due)
+                if not due:
+                    self._discard_stale()
+                    self._announce_next()
+                    timeout = self.MAX_WAIT
+                    if self._heap:
+                        timeout = min(timeout, max(self._heap[0][0] - now, 0))
+                    self._cond.wait(timeout)
+                    continue
+
+            for key, payload, due_at in due:
+                try:
+                    self.on_due(key, payload, due_at)
+                except Exception as e:
+                    print(f"Error handling reminder {key}: {e}")
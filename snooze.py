@@ -0,0 +1,87 @@
+import time
+
+from outbox import REPLAY_GRACE_MINUTES
+from stats import timed
+
+# ----------------- SNOOZE / ACKNOWLEDGE -----------------
+# A fired dose can be snoozed ("remind me in 10 minutes") or acknowledged
+# (taken or skipped).  A snooze adds one scheduler entry under its own key,
+# ("snooze", medicine id).  The reminder's own entry, including a recurring
+# reminder's next dose, stays queued as it was.  Its payload is ``(name,
+# due_at, remind_at)``: the dose that was snoozed, which answers are logged
+# against, and the snooze time, which keys its claim and outbox entry.  The
+# snooze is also stored as one row in the snoozes table, so it survives a
+# restart.
+#
+# Snoozing costs a heap push in memory and a primary-key upsert on disk.
+# Acknowledging costs a lazy cancel and a primary-key delete.  Neither cost
+# grows with the size of the schedule, and nothing is reloaded.
+
+SNOOZE_MINUTES = 10
+
+
+def snooze_key(medicine_id):
+    return ("snooze", medicine_id)
+
+
+def split_key(key):
+    """``(medicine_id, snoozed)`` for a scheduler key."""
+    if isinstance(key, tuple) and key[0] == "snooze":
+        return key[1], True
+    return key, False
+
+
+def payload_name(payload):
+    """Medicine name of a scheduler payload, snoozed or not."""
+    return payload[0] if isinstance(payload, tuple) else payload
+
+
+class Snoozer:
+    """Snooze and acknowledge actions on top of a ReminderScheduler.
+
+    Acknowledging records the answer in the dose log and drops any snooze
+    still pending, so the dose is not announced again.
+    """
+
+    def __init__(self, db, scheduler, dose_log, replay_window=REPLAY_GRACE_MINUTES * 60):
+        self.db = db
+        self.scheduler = scheduler
+        self.dose_log = dose_log
+        self.replay_window = replay_window
+
+    def entries(self, now=None):
+        """Scheduler entries for pending snoozes.  Snoozes that came due
+        while the app was closed fire at once, within the replay window."""
+        now = int(time.time()) if now is None else now
+        rows = self.db.query("SELECT medicine_id, name, due_at, remind_at FROM snoozes WHERE remind_at >= ?",
+                             (now - self.replay_window,))
+        return [(snooze_key(medicine_id), max(remind_at, now), (name, due_at, remind_at))
+                for medicine_id, name, due_at, remind_at in rows]
+
+    @timed("snooze.snooze")
+    def snooze(self, medicine_id, name, due_at, minutes=SNOOZE_MINUTES):
+        """Announce the dose due at ``due_at`` again in ``minutes``; returns when."""
+        remind_at = int(time.time()) + int(minutes * 60)
+        self.db.execute("""
+        INSERT INTO snoozes (medicine_id, name, due_at, remind_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (medicine_id) DO UPDATE SET name = excluded.name, due_at = excluded.due_at,
+            remind_at = excluded.remind_at
+        """, (medicine_id, name, due_at, remind_at))
+        # Replaces an earlier snooze of the same reminder (lazy deletion)
+        self.scheduler.schedule(snooze_key(medicine_id), remind_at, (name, due_at, remind_at))
+        self.dose_log.record(medicine_id, name, due_at, "snoozed")
+        return remind_at
+
+    @timed("snooze.acknowledge")
+    def acknowledge(self, medicine_id, name, due_at, event="taken"):
+        self.cancel(medicine_id)
+        self.dose_log.record(medicine_id, name, due_at, event)
+
+    def cancel(self, medicine_id):
+        """Drop the pending snooze of a reminder, if any."""
+        self.scheduler.cancel(snooze_key(medicine_id))
+        self.db.execute("DELETE FROM snoozes WHERE medicine_id = ?", (medicine_id,))
+
+    def fired(self, medicine_id, remind_at):
+        # A later snooze of the same reminder (remind_at further out) stays
+        self.db.execute("DELETE FROM snoozes WHERE medicine_id = ? AND remind_at <= ?", (medicine_id, remind_at))
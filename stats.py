@@ -0,0 +1,168 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# ----------------- RUNTIME STATS -----------------
+# Lightweight timing for the hot paths (DB queries, list refreshes, checker
+# ticks, notification delivery).  Off unless MEDICINE_REMINDER_STATS is set
+# (or switched on from a diagnostics panel); when off, every instrumented
+# call costs one attribute check.  While on, a STATS line is logged
+# periodically either way.
+#
+#   MEDICINE_REMINDER_STATS=1    collect, and log a STATS line every 60 s
+#   MEDICINE_REMINDER_STATS=10   collect, log every 10 s
+
+
+class Metric:
+    SAMPLES = 2048  # recent samples kept for percentiles
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def add(self, elapsed_ms, rows):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        self.samples.append(elapsed_ms)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": round(ordered[len(ordered) // 2], 3) if ordered else 0.0,
+            "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3) if ordered else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "rows": self.rows,
+        }
+
+
+class Stats:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def record(self, name, elapsed_ms, rows=0):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric()
+            metric.add(elapsed_ms, rows)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: metric.summary() for name, metric in sorted(self._metrics.items())}
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def format(self):
+        """Human-readable table for the diagnostics panels."""
+        snapshot = self.snapshot()
+        if not self.enabled and not snapshot:
+            return "Stats collection is off."
+        lines = [f"{'metric':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'rows':>10}"]
+        for name, s in snapshot.items():
+            lines.append(f"{name:<28}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+                         f"{s['max_ms']:>10.2f}{s['rows']:>10}")
+        return "\n".join(lines)
+
+    def log_line(self):
+        return "STATS " + json.dumps({"ts": int(time.time()), "metrics": self.snapshot()})
+
+    def toggle(self):
+        """Switch collection on or off (the diagnostics panels' button)."""
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.start_logging(LOG_INTERVAL)
+        return self.enabled
+
+    def start_logging(self, interval=60):
+        """Print a structured STATS line every ``interval`` seconds."""
+        if self._logger is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                if self.enabled:
+                    print(self.log_line())
+
+        self._logger = threading.Thread(target=run, daemon=True)
+        self._logger.start()
+
+
+class _Timer:
+    __slots__ = ("name", "rows", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stats.record(self.name, (time.perf_counter() - self.started) * 1000, self.rows)
+        return False
+
+
+class _NullTimer:
+    # Shared no-op returned while stats are off; `rows` writes are discarded
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """``with timer("db.query") as t: ...; t.rows = n``"""
+    return _Timer(name) if stats.enabled else _NULL_TIMER
+
+
+def timed(name, rows=None):
+    """Decorator form of ``timer``; ``rows(result)`` counts rows touched."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            stats.record(name, (time.perf_counter() - started) * 1000, rows(result) if rows else 0)
+            return result
+        return wrapper
+    return decorate
+
+
+def _from_environment():
+    value = os.environ.get("MEDICINE_REMINDER_STATS", "")
+    return value not in ("", "0"), (int(value) if value.isdigit() and int(value) > 1 else 60)
+
+
+_enabled, LOG_INTERVAL = _from_environment()
+stats = Stats(enabled=_enabled)
+if _enabled:
+    stats.start_logging(LOG_INTERVAL)
@@ -0,0 +1,136 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from stats import timed
+
+# ----------------- IN-MEMORY REMINDER STORE -----------------
+# The list views and the reminder checker keep asking SQLite for the same
+# rows: reminders still ahead plus the recurring ones.  ReminderStore keeps
+# those rows in memory, loaded once and kept current by writing through on
+# add/update/delete, so rendering and due-time lookups never touch the disk.
+# Anything older than the loaded horizon is passed on to the database.
+
+
+class ReminderStore:
+    """Write-through cache of upcoming and recurring reminders.
+
+    ``rows`` maps id -> (id, name, date, time, due_at, rule) and ``_keys`` is
+    the (due_at, id) index of the one-off rows, kept sorted for range reads.
+    Reads take a short lock around the in-memory structures only; writers
+    are serialized on a second lock that also covers the database write, so
+    memory and disk are always updated in the same order.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.rows = {}
+        self._keys = []       # (due_at, id) of one-off rows, sorted
+        self._recurring = set()
+        self.horizon = None   # one-off rows due before this are not cached
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    @timed("store.load", rows=len)
+    def load(self, since=None):
+        """(Re)load every reminder due at or after ``since``, plus recurring ones."""
+        since = int(time.time()) - 60 if since is None else since
+        rows = self.db.query("""
+        SELECT id, name, date, time, due_at, rule FROM medicines WHERE due_at >= ? AND rule IS NULL
+        UNION ALL
+        SELECT id, name, date, time, due_at, rule FROM medicines WHERE rule IS NOT NULL
+        """, (since,))
+        keys = sorted((row[4], row[0]) for row in rows if row[5] is None)
+        with self._lock:
+            self.rows = {row[0]: row for row in rows}
+            self._keys = keys
+            self._recurring = {row[0] for row in rows if row[5] is not None}
+            self.horizon = since
+        return self
+
+    # ----------------- write-through -----------------
+
+    def add_medicine(self, name, date, time_12, rule=None):
+        with self._write_lock:
+            row_id, due_at = self.db.add_medicine(name, date, time_12, rule)
+            self._put((row_id, name, date, time_12, due_at, rule))
+        return row_id, due_at
+
+    def update_medicine(self, id, name, date, time_12, rule=None):
+        with self._write_lock:
+            due_at = self.db.update_medicine(id, name, date, time_12, rule)
+            self._put((id, name, date, time_12, due_at, rule))
+        return due_at
+
+    def delete_medicine(self, id):
+        with self._write_lock:
+            self.db.delete_medicine(id)
+            with self._lock:
+                self._discard(id)
+
+    def apply(self, rows, deleted):
+        """Take in rows written elsewhere (see database.ChangeWatcher)."""
+        with self._lock:
+            for row_id in deleted:
+                self._discard(row_id)
+        for row in rows:
+            self._put(tuple(row))
+
+    def _put(self, row):
+        with self._lock:
+            self._discard(row[0])
+            if self.horizon is None:
+                return  # not loaded yet; load() will pick the row up
+            row_id, due_at, rule = row[0], row[4], row[5]
+            if rule is not None:
+                self._recurring.add(row_id)
+            elif due_at is not None and due_at >= self.horizon:
+                insort(self._keys, (due_at, row_id))
+            else:
+                return  # older than the horizon; only the database has it
+            self.rows[row_id] = row
+
+    def _discard(self, row_id):
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return
+        if row[5] is not None:
+            self._recurring.discard(row_id)
+        else:
+            index = bisect_left(self._keys, (row[4], row_id))
+            del self._keys[index]
+
+    # ----------------- reads -----------------
+
+    def get(self, row_id):
+        return self.rows.get(row_id)
+
+    def upcoming_reminders(self, since):
+        """Same rows as ``Database.upcoming_reminders``, served from memory."""
+        if self.horizon is None or since < self.horizon:
+            return self.db.upcoming_reminders(since)
+        with self._lock:
+            rows = self.rows
+            start = bisect_left(self._keys, (since, float("-inf")))
+            one_off = [rows[row_id] for due_at, row_id in self._keys[start:]]
+            recurring = [rows[row_id] for row_id in self._recurring]
+        return [(row[0], row[4], row[1], row[5]) for row in one_off + recurring]
+
+    def page_medicines(self, after=None, before=None, limit=200):
+        """Same pages as ``Database.page_medicines``; memory answers any page
+        that lies entirely above the horizon."""
+        if before is not None or after is None or self.horizon is None or after[0] < self.horizon:
+            return self.db.page_medicines(after=after, before=before, limit=limit)
+        with self._lock:
+            start = bisect_right(self._keys, tuple(after))
+            return [self.rows[row_id] for due_at, row_id in self._keys[start:start + limit]]
+
+    def recurring_medicines(self):
+        if self.horizon is None:
+            return self.db.recurring_medicines()
+        with self._lock:
+            return [self.rows[row_id] for row_id in self._recurring]
+
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "medicine_reminder.db"))
+    db.setup()
+    yield db
+    db.close()
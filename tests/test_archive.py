@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from archive import Archiver, history
+
+NOW = int(time.time())
+DAY = 86400
+
+
+@pytest.fixture
+def archiver(db):
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO medicines (name, date, time, due_at, rule) VALUES (?, '', '', ?, ?)", [
+            ("Old", NOW - 40 * DAY, None),
+            ("Older", NOW - 50 * DAY, None),
+            ("Recent", NOW - 5 * DAY, None),
+            ("Ended", NOW - 60 * DAY, "FREQ=DAILY;COUNT=3"),
+            ("Ongoing", NOW - 60 * DAY, "FREQ=DAILY"),
+        ])
+    return Archiver(db, after_days=30, batch_size=1, pause=0)
+
+
+def test_archive_moves_past_reminders(db, archiver):
+    assert archiver.archive(now=NOW) == 3
+    assert db.query("SELECT name FROM medicines ORDER BY id") == [("Recent",), ("Ongoing",)]
+    assert db.query("SELECT name, archived_at FROM medicines_archive ORDER BY id") == [
+        ("Old", NOW), ("Older", NOW), ("Ended", NOW)]
+
+
+def test_history_pages_newest_first(db, archiver):
+    archiver.archive(now=NOW)
+    assert [row[1] for row in history(db, 10)] == ["Old", "Older", "Ended"]
+    assert [row[1] for row in history(db, 2)] == ["Old", "Older"]
+
+
+def test_vacuum_leaves_a_non_incremental_database_alone(db, archiver):
+    with db.transaction() as conn:
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+    assert archiver.vacuum() == 0
+    assert db.query_one("PRAGMA auto_vacuum") == (0,)
@@ -0,0 +1,41 @@
+import pytest
+
+from database import ChangeWatcher, Database
+
+
+@pytest.fixture
+def other(db):
+    # A second process writing to the same file
+    other = Database(db.db_name)
+    yield other
+    other.close()
+
+
+def test_poll_is_quiet_without_commits(db):
+    watcher = ChangeWatcher(db)
+    assert watcher.poll() is None
+    assert watcher.poll() is None
+
+
+def test_poll_returns_rows_changed_elsewhere(db, other):
+    kept, _ = db.add_medicine("Aspirin", "2099-01-01", "08:00 AM")
+    gone, _ = db.add_medicine("Insulin", "2099-01-01", "09:00 AM")
+    watcher = ChangeWatcher(db)
+
+    other.update_medicine(kept, "Aspirin 100mg", "2099-01-02", "08:00 AM")
+    other.delete_medicine(gone)
+    added, _ = other.add_medicine("Iron", "2099-01-03", "08:00 AM")
+
+    rows, deleted = watcher.poll()
+    assert sorted((row[0], row[1]) for row in rows) == [(kept, "Aspirin 100mg"), (added, "Iron")]
+    assert deleted == [gone]
+    assert watcher.poll() is None
+
+
+def test_poll_asks_for_a_reload_when_too_far_behind(db, other):
+    watcher = ChangeWatcher(db)
+    for i in range(5):
+        other.add_medicine(f"Dose {i}", "2099-01-01", "08:00 AM")
+    with other.transaction() as conn:
+        conn.execute("DELETE FROM medicine_changes WHERE seq <= (SELECT MAX(seq) FROM medicine_changes) - 2")
+    assert watcher.poll() == (None, None)
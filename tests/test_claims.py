@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from claims import OccurrenceClaims
+
+
+@pytest.fixture
+def claims():
+    claims = OccurrenceClaims(lease=60, owner="here")
+    yield claims
+    claims.stop()
+
+
+def test_fires_once(db, claims):
+    fired = []
+    assert claims.fire_once(db, 1, 1000, lambda: fired.append(1))
+    assert not claims.fire_once(db, 1, 1000, lambda: fired.append(2))
+    assert not OccurrenceClaims(owner="elsewhere").fire_once(db, 1, 1000, lambda: fired.append(3))
+    assert fired == [1]
+
+
+def test_unlapsed_lease_is_not_taken_over(db, claims):
+    now = int(time.time())
+    assert db.claim_occurrence(1, now, "elsewhere", now, now + 60) == (True, now + 60)
+
+    fired = []
+    assert not claims.fire_once(db, 1, now, lambda: fired.append(1))
+    assert fired == []
+    # A retry is set up for when the other process's lease runs out
+    assert len(claims._retries) == 1
+
+
+def test_lapsed_lease_is_taken_over(db, claims):
+    now = int(time.time())
+    db.claim_occurrence(1, now - 120, "elsewhere", now - 120, now - 60)
+
+    fired = []
+    assert claims.fire_once(db, 1, now - 120, lambda: fired.append(1))
+    assert fired == [1]
+    assert db.query("SELECT owner FROM reminder_claims") == [("here",)]
+
+
+def test_failed_fire_releases_the_claim(db, claims):
+    def fire():
+        raise RuntimeError("no backend")
+
+    with pytest.raises(RuntimeError):
+        claims.fire_once(db, 1, 1000, fire)
+    assert db.query("SELECT * FROM reminder_claims") == []
+    assert OccurrenceClaims(owner="elsewhere").fire_once(db, 1, 1000, lambda: None)
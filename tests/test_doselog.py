@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from doselog import DoseLog, adherence, daily_adherence
+
+
+def at(*args):
+    return int(datetime(*args).timestamp())
+
+
+def test_write_folds_events_into_the_rollups(db):
+    log = DoseLog(db)
+    log.write([
+        (1, "Aspirin", at(2025, 3, 1, 8, 0), "notified", at(2025, 3, 1, 8, 0)),
+        (1, "Aspirin", at(2025, 3, 1, 8, 0), "taken", at(2025, 3, 1, 8, 5)),
+        (1, "Aspirin", at(2025, 3, 2, 8, 0), "notified", at(2025, 3, 2, 8, 0)),
+        (2, "Insulin", at(2025, 3, 2, 9, 0), "notified", at(2025, 3, 2, 9, 0)),
+    ])
+    log.write([(2, "Insulin", at(2025, 3, 2, 9, 0), "skipped", at(2025, 3, 2, 9, 1))])
+
+    assert adherence(db) == [(1, "Aspirin", 2, 1, 0, 0), (2, "Insulin", 1, 0, 1, 0)]
+    assert adherence(db, "2025-03-02", "2025-03-02") == [(1, "Aspirin", 1, 0, 0, 0), (2, "Insulin", 1, 0, 1, 0)]
+    assert daily_adherence(db, "2025-03-01", "2025-03-31") == [("2025-03-01", 1, 1, 0, 0), ("2025-03-02", 2, 0, 1, 0)]
+
+
+def test_recorded_events_are_flushed_on_stop(db):
+    log = DoseLog(db, flush_interval=60).start()
+    due_at = at(2025, 3, 1, 8, 0)
+    log.record(1, "Aspirin", due_at, "notified")
+    log.record(1, "Aspirin", due_at, "taken")
+    log.stop()
+
+    assert db.query("SELECT event FROM dose_events ORDER BY id") == [("notified",), ("taken",)]
+    assert log.last_notified(1) == due_at
+    assert log.answered(1, due_at)
+    assert not log.answered(1, due_at + 86400)
@@ -0,0 +1,37 @@
+from importer import import_file, main
+
+CSV = """name,date,time,repeat
+Aspirin,2025-03-01,08:00 AM,
+,2025-03-01,08:00 AM,
+Ibuprofen,2025-02-30,08:00 AM,
+Vitamin D,2025-03-01,13:00 PM,
+Insulin,2025-03-01,07:30 am,every 8 hours
+Iron,2025-03-01
+Zinc,2025-03-01,09:00 AM,twice daily
+"""
+
+
+def test_rejects_are_reported_with_line_numbers(db, tmp_path):
+    path = tmp_path / "schedule.csv"
+    path.write_text(CSV)
+
+    result = import_file(db, str(path))
+    assert result.imported == 2
+    assert [(line_no, raw.split(",")[0]) for line_no, reason, raw in result.rejected] == [
+        (3, ""), (4, "Ibuprofen"), (5, "Vitamin D"), (7, "Iron"), (8, "Zinc")]
+    reasons = [reason for line_no, reason, raw in result.rejected]
+    assert reasons[0] == "missing medicine name"
+    assert "expected HH:MM AM/PM" in reasons[2]
+    assert reasons[3] == "expected name,date,time[,repeat]"
+    assert reasons[4].startswith("Could not understand repeat rule: 'twice daily'")
+    assert db.query("SELECT name, rule FROM medicines ORDER BY id") == [
+        ("Aspirin", None), ("Insulin", "FREQ=HOURLY;INTERVAL=8")]
+
+
+def test_rejects_file(tmp_path):
+    path = tmp_path / "schedule.csv"
+    path.write_text("Iron,2025-03-01\n")
+    rejects = tmp_path / "rejects.txt"
+
+    assert main([str(path), "--db", str(tmp_path / "import.db"), "--rejects", str(rejects)]) == 1
+    assert rejects.read_text() == "line 1: expected name,date,time[,repeat]: Iron,2025-03-01\n"
@@ -0,0 +1,52 @@
+import pytest
+
+from list_model import ReminderPager
+
+BASE = 1_900_000_000
+
+
+@pytest.fixture
+def pager(db):
+    # Twenty one-off doses a minute apart, ids 1..20, and one recurring row
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO medicines (name, date, time, due_at) VALUES (?, '', '', ?)",
+                         [(f"Dose {i}", BASE + i * 60) for i in range(20)])
+        conn.execute("INSERT INTO medicines (name, date, time, due_at, rule) VALUES ('Daily', '', '', ?, 'FREQ=DAILY')",
+                     (BASE,))
+    return ReminderPager(db, page_size=3, max_rows=5)
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def test_first_page_starts_at_next_dose(pager):
+    rows = pager.first_page(now=BASE + 5 * 60 - 1)
+    assert ids(rows) == [21, 6, 7, 8]
+    assert pager.has_older and pager.has_later
+
+
+def test_pages_trim_the_far_end(pager):
+    pager.first_page(now=BASE + 5 * 60 - 1)
+
+    rows, dropped = pager.later_page()
+    assert ids(rows) == [9, 10, 11]
+    assert dropped == [6]
+
+    rows, dropped = pager.older_page()
+    assert ids(rows) == [4, 5, 6]
+    assert dropped == [9, 10, 11]
+    assert len(pager._keys) == 5
+
+
+def test_track_window(pager):
+    pager.first_page(now=BASE + 5 * 60 - 1)
+    assert pager.track(30, BASE + 6 * 60 + 30)
+    assert not pager.track(31, BASE + 19 * 60)  # past the last loaded page
+    assert not pager.track(32, BASE)            # before the window
+    assert pager.track(33, BASE, "FREQ=DAILY")
+    assert not pager.track(34, None)
+
+    # Moving a tracked row out of the window forgets it
+    assert not pager.track(30, BASE + 19 * 60)
+    assert 30 not in pager._due
@@ -0,0 +1,56 @@
+import time
+
+from notifier import MemoryBackend, NotificationDispatcher
+
+
+class FailingBackend:
+    name = "failing"
+
+    def send(self, title, message):
+        raise OSError("unavailable")
+
+
+def test_doses_due_in_the_same_minute_are_grouped():
+    backend = MemoryBackend()
+    dispatcher = NotificationDispatcher([backend], title="Reminder", linger=0.05).start()
+    delivered = []
+    dispatcher.submit("Aspirin", 600, on_delivered=lambda: delivered.append("Aspirin"))
+    dispatcher.submit("Insulin", 630, on_delivered=lambda: delivered.append("Insulin"))
+    dispatcher.submit("Iron", 660)
+    dispatcher.stop()
+    for thread in dispatcher._threads:
+        thread.join(5)
+
+    assert sorted(backend.sent) == [
+        ("Reminder", "Time to take your medicine: Iron"),
+        ("Reminder", "Time to take your medicines (2): Aspirin, Insulin"),
+    ]
+    assert sorted(delivered) == ["Aspirin", "Insulin"]
+    assert (dispatcher.delivered, dispatcher.failed) == (2, 0)
+
+
+def test_falls_through_to_the_next_backend():
+    backend = MemoryBackend()
+    dispatcher = NotificationDispatcher([FailingBackend(), backend], retries=1, retry_delay=0)
+    assert dispatcher.deliver(["Aspirin"])
+    assert backend.sent == [("Medicine Reminder", "Time to take your medicine: Aspirin")]
+
+
+def test_every_backend_failing():
+    dispatcher = NotificationDispatcher([FailingBackend()], retries=0)
+    assert not dispatcher.deliver(["Aspirin"])
+
+
+def test_backend_call_timeout():
+    class SlowBackend(MemoryBackend):
+        call_timeout = 0.1
+
+        def send(self, title, message):
+            time.sleep(1)
+
+    backend = MemoryBackend()
+    dispatcher = NotificationDispatcher([SlowBackend(), backend], timeout=10, retries=0)
+    started = time.monotonic()
+    assert dispatcher.deliver(["Aspirin"])
+    assert time.monotonic() - started < 1
+    assert len(backend.sent) == 1
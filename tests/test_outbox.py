@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from outbox import NotificationOutbox
+
+NOW = int(time.time())
+
+
+class StubDispatcher:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, name, due_at=None, on_delivered=None):
+        self.submitted.append((name, on_delivered))
+
+
+@pytest.fixture
+def dispatcher():
+    return StubDispatcher()
+
+
+@pytest.fixture
+def outbox(db, dispatcher):
+    return NotificationOutbox(db, dispatcher, retry_after=300)
+
+
+def test_send_then_deliver(db, outbox, dispatcher):
+    outbox.send(1, "Aspirin", NOW)
+    assert [name for name, on_delivered in dispatcher.submitted] == ["Aspirin"]
+
+    dispatcher.submitted[0][1]()
+    assert outbox.replay(now=NOW + 3600) == 0
+    assert db.query_one("SELECT delivered_at IS NOT NULL FROM notification_outbox") == (1,)
+
+
+def test_undelivered_entry_backs_off(db, outbox, dispatcher):
+    db.execute("INSERT INTO notification_outbox (medicine_id, name, due_at, created_at) VALUES (1, 'Aspirin', ?, ?)",
+               (NOW, NOW))
+    # Never attempted (the app stopped between recording and submitting)
+    assert outbox.replay(now=NOW, missed=False) == 1
+
+    # Checked every 30 seconds: the entry goes out again after 5 minutes,
+    # then after a further 10
+    sent_at = [now for now in range(NOW + 30, NOW + 1200, 30) if outbox.replay(now=now, missed=False)]
+    assert sent_at == [NOW + 300, NOW + 900]
+    assert len(dispatcher.submitted) == 3
+    assert db.query_one("SELECT attempts FROM notification_outbox") == (3,)
+
+
+def test_startup_replay_skips_entries_just_submitted(outbox, dispatcher):
+    outbox.send(1, "Aspirin", NOW)
+    assert outbox.replay(now=NOW + 1) == 0
+    assert len(dispatcher.submitted) == 1
+
+
+def test_missed_doses_are_replayed(db, dispatcher):
+    missed = []
+    outbox = NotificationOutbox(db, dispatcher, on_missed=lambda *dose: missed.append(dose), grace=3600)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO medicines (name, date, time, due_at, rule) VALUES (?, '', '', ?, ?)", [
+            ("Too old", NOW - 7200, None),
+            ("Missed", NOW - 600, None),
+            ("Upcoming", NOW + 600, None),
+            ("Hourly", NOW - 86400, "FREQ=HOURLY"),
+        ])
+    outbox.send(2, "Missed", NOW - 600)  # fired and recorded before the app stopped
+
+    assert outbox.replay(now=NOW) == 1
+    assert missed == [(4, "Hourly", NOW - 3600)]
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import Recurrence
+
+
+def at(*args):
+    return int(datetime(*args).timestamp())
+
+
+def test_count_limits_doses():
+    start = at(2025, 3, 1, 8, 0)
+    recurrence = Recurrence.parse("FREQ=HOURLY;INTERVAL=8;COUNT=3")
+    assert list(recurrence.occurrences(start)) == [start, start + 8 * 3600, start + 16 * 3600]
+    # COUNT is counted from the anchor, not from `after`
+    assert list(recurrence.occurrences(start, after=start)) == [start + 8 * 3600, start + 16 * 3600]
+
+
+def test_until_is_inclusive():
+    recurrence = Recurrence.parse("FREQ=DAILY;UNTIL=20250303T235959")
+    assert list(recurrence.occurrences(at(2025, 3, 1, 21, 0))) == [
+        at(2025, 3, 1, 21, 0), at(2025, 3, 2, 21, 0), at(2025, 3, 3, 21, 0)]
+
+
+def test_weekly_interval():
+    # Every other week on Monday and Wednesday, starting on a Wednesday
+    recurrence = Recurrence.parse("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=5")
+    assert list(recurrence.occurrences(at(2025, 1, 8, 9, 0))) == [
+        at(2025, 1, 8, 9, 0), at(2025, 1, 20, 9, 0), at(2025, 1, 22, 9, 0),
+        at(2025, 2, 3, 9, 0), at(2025, 2, 5, 9, 0)]
+
+
+def test_weekly_count_after_skipped_weeks():
+    recurrence = Recurrence.parse("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=5")
+    start = at(2025, 1, 8, 9, 0)
+    assert list(recurrence.occurrences(start, after=at(2025, 1, 21, 0, 0))) == [
+        at(2025, 1, 22, 9, 0), at(2025, 2, 3, 9, 0), at(2025, 2, 5, 9, 0)]
+    assert recurrence.next_after(start, at(2025, 2, 5, 9, 0)) is None
+
+
+def test_between_is_half_open():
+    start = at(2025, 3, 1, 8, 0)
+    recurrence = Recurrence.parse("FREQ=DAILY")
+    assert list(recurrence.between(start, at(2025, 3, 2, 8, 0), at(2025, 3, 4, 8, 0))) == [
+        at(2025, 3, 2, 8, 0), at(2025, 3, 3, 8, 0)]
+
+
+@pytest.mark.parametrize("text, rule", [
+    ("daily", "FREQ=DAILY"),
+    ("every 8 hours", "FREQ=HOURLY;INTERVAL=8"),
+    ("mon, wed and fri", "FREQ=WEEKLY;BYDAY=MO,WE,FR"),
+    ("weekly on tue until 2025-06-30", "FREQ=WEEKLY;BYDAY=TU;UNTIL=2025-06-30"),
+    ("every 12 hours for 14 doses", "FREQ=HOURLY;INTERVAL=12;COUNT=14"),
+    ("every 2 weeks on Mo,We until 2025-12-31, 5 doses", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=2025-12-31;COUNT=5"),
+])
+def test_from_text(text, rule):
+    assert str(Recurrence.from_text(text)) == rule
+    # The list shows describe(), which the edit form hands back unchanged
+    assert str(Recurrence.from_text(Recurrence.parse(rule).describe())) == rule
+
+
+@pytest.mark.parametrize("text", [
+    "3 times daily",
+    "twice daily",
+    "every 8 hours for 3 days",
+    "daily with food",
+    "until 2025-06-30",
+    "every day on mon",
+])
+def test_from_text_rejects_unsupported_phrases(text):
+    with pytest.raises(ValueError):
+        Recurrence.from_text(text)
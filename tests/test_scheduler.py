@@ -0,0 +1,80 @@
+import queue
+import time
+
+import pytest
+
+from scheduler import ReminderScheduler
+
+
+def every(start, step):
+    """``repeat`` for doses at start, start + step, ..."""
+    return lambda after: start + (max(after - start, -1) // step + 1) * step
+
+
+@pytest.fixture
+def scheduler():
+    return ReminderScheduler(on_due=lambda key, payload, due_at: None, grace=60)
+
+
+def test_entries_older_than_grace_are_dropped(scheduler):
+    now = int(time.time())
+    scheduler.schedule("late", now - 120, "Aspirin")
+    scheduler.schedule("recent", now - 30, "Insulin")
+    assert len(scheduler) == 1
+    assert scheduler.next_due() == now - 30
+
+
+def test_late_recurring_entry_moves_to_its_next_dose(scheduler):
+    now = int(time.time())
+    scheduler.schedule("hourly", now - 7200, "Aspirin", every(now - 7200, 3600))
+    assert scheduler.next_due() == now
+
+
+def test_fired_dose_is_not_fired_again_on_reload(scheduler):
+    now = int(time.time())
+    hourly = every(now - 1, 3600)
+    scheduler.schedule("once", now - 1, "Aspirin")
+    scheduler.schedule("hourly", now - 1, "Insulin", hourly)
+    with scheduler._cond:
+        due = scheduler._pop_due(now)
+    assert sorted(key for key, payload, due_at in due) == ["hourly", "once"]
+
+    # The same rows come back from a reload of the source
+    scheduler.schedule("once", now - 1, "Aspirin")
+    scheduler.schedule("hourly", now - 1, "Insulin", hourly)
+    assert len(scheduler) == 1
+    assert scheduler.next_due() == now + 3599
+
+
+def test_stall_past_grace_skips_stale_doses(scheduler):
+    now = int(time.time())
+    scheduler.schedule("once", now + 1, "Aspirin")
+    scheduler.schedule("often", now + 1, "Insulin", every(now + 1, 600))
+    with scheduler._cond:
+        # The thread wakes an hour late: only the dose due right then fires
+        due = scheduler._pop_due(now + 3601)
+    assert due == [("often", "Insulin", now + 3601)]
+    assert len(scheduler) == 1
+    assert scheduler.next_due() == now + 4201
+
+
+def test_cancel_and_reschedule(scheduler):
+    now = int(time.time())
+    scheduler.schedule("a", now + 60, "Aspirin")
+    scheduler.schedule("a", now + 30, "Aspirin")
+    scheduler.schedule("b", now + 10, "Insulin")
+    scheduler.cancel("b")
+    assert len(scheduler) == 1
+    assert scheduler.next_due() == now + 30
+
+
+def test_thread_fires_due_entries():
+    fired = queue.Queue()
+    scheduler = ReminderScheduler(on_due=lambda key, payload, due_at: fired.put((key, payload)),
+                                  load=lambda: [("loaded", time.time() + 0.05, "Aspirin")])
+    scheduler.start()
+    try:
+        scheduler.schedule("added", time.time() + 0.1, "Insulin")
+        assert [fired.get(timeout=2), fired.get(timeout=2)] == [("loaded", "Aspirin"), ("added", "Insulin")]
+    finally:
+        scheduler.stop()
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from scheduler import ReminderScheduler
+from snooze import Snoozer, snooze_key, split_key
+
+
+class RecordingLog:
+    def __init__(self):
+        self.events = []
+
+    def record(self, medicine_id, name, due_at, event):
+        self.events.append((medicine_id, due_at, event))
+
+
+@pytest.fixture
+def scheduler():
+    return ReminderScheduler(on_due=lambda key, payload, due_at: None)
+
+
+@pytest.fixture
+def dose_log():
+    return RecordingLog()
+
+
+@pytest.fixture
+def snoozer(db, scheduler, dose_log):
+    return Snoozer(db, scheduler, dose_log, replay_window=3600)
+
+
+def test_snooze_schedules_a_second_entry(db, snoozer, scheduler, dose_log):
+    due_at = int(time.time()) - 30
+    scheduler.schedule(1, due_at + 86400, "Aspirin")
+    remind_at = snoozer.snooze(1, "Aspirin", due_at, minutes=10)
+
+    assert len(scheduler) == 2
+    assert scheduler.next_due() == remind_at
+    assert split_key(snooze_key(1)) == (1, True)
+    assert db.query("SELECT medicine_id, due_at, remind_at FROM snoozes") == [(1, due_at, remind_at)]
+    assert dose_log.events == [(1, due_at, "snoozed")]
+
+    # Snoozing again replaces the earlier snooze
+    later = snoozer.snooze(1, "Aspirin", due_at, minutes=20)
+    assert len(scheduler) == 2
+    assert db.query("SELECT remind_at FROM snoozes") == [(later,)]
+
+
+def test_acknowledge_drops_the_snooze(db, snoozer, scheduler, dose_log):
+    due_at = int(time.time()) - 30
+    snoozer.snooze(1, "Aspirin", due_at)
+    snoozer.acknowledge(1, "Aspirin", due_at, "taken")
+
+    assert len(scheduler) == 0
+    assert db.query("SELECT * FROM snoozes") == []
+    assert dose_log.events[-1] == (1, due_at, "taken")
+
+
+def test_entries_survive_a_restart(db, snoozer, scheduler):
+    now = int(time.time())
+    db.execute("INSERT INTO snoozes (medicine_id, name, due_at, remind_at) VALUES (1, 'Aspirin', ?, ?), "
+               "(2, 'Insulin', ?, ?), (3, 'Iron', ?, ?)",
+               (now - 900, now + 300, now - 1800, now - 600, now - 9000, now - 7200))
+    assert sorted(snoozer.entries(now)) == [
+        (snooze_key(1), now + 300, ("Aspirin", now - 900, now + 300)),
+        # Came due while closed: fires at once, still answered for its dose
+        (snooze_key(2), now, ("Insulin", now - 1800, now - 600)),
+    ]
+
+
+def test_fired_keeps_a_later_snooze(db, snoozer):
+    due_at = int(time.time()) - 30
+    remind_at = snoozer.snooze(1, "Aspirin", due_at)
+    snoozer.fired(1, remind_at - 60)
+    assert db.query("SELECT remind_at FROM snoozes") == [(remind_at,)]
+    snoozer.fired(1, remind_at)
+    assert db.query("SELECT * FROM snoozes") == []
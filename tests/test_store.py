@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from database import due_timestamp
+from store import ReminderStore
+
+
+@pytest.fixture
+def store(db):
+    db.add_medicine("Past", "2020-01-01", "08:00 AM")
+    db.add_medicine("Daily", "2020-01-01", "09:00 AM", "FREQ=DAILY")
+    db.add_medicine("Upcoming", "2099-01-01", "08:00 AM")
+    return ReminderStore(db).load(since=int(time.time()))
+
+
+def test_load_caches_upcoming_and_recurring(store):
+    assert sorted(row[1] for row in store.rows.values()) == ["Daily", "Upcoming"]
+
+
+def test_writes_go_to_memory_and_disk(db, store):
+    row_id, due_at = store.add_medicine("Aspirin", "2098-06-01", "07:30 AM")
+    assert due_at == due_timestamp("2098-06-01", "07:30 AM")
+    assert store.get(row_id) == db.query_one("SELECT id, name, date, time, due_at, rule FROM medicines WHERE id = ?",
+                                             (row_id,))
+
+    store.update_medicine(row_id, "Aspirin", "2097-06-01", "07:30 AM")
+    assert [row[1] for row in store.page_medicines(after=(store.horizon, 0))] == ["Aspirin", "Upcoming"]
+
+    # Moved behind the horizon: only the database keeps it
+    store.update_medicine(row_id, "Aspirin", "2020-06-01", "07:30 AM")
+    assert store.get(row_id) is None
+    assert db.query_one("SELECT name FROM medicines WHERE id = ?", (row_id,)) == ("Aspirin",)
+
+    store.delete_medicine(3)
+    assert store.get(3) is None
+    assert db.query_one("SELECT 1 FROM medicines WHERE id = 3") is None
+
+
+def test_reads_match_the_database(db, store):
+    store.add_medicine("Aspirin", "2098-06-01", "07:30 AM", "FREQ=WEEKLY")
+    since = store.horizon + 60
+    assert sorted(store.upcoming_reminders(since)) == sorted(db.upcoming_reminders(since))
+    assert sorted(store.recurring_medicines()) == sorted(db.recurring_medicines())
+    # Before the horizon the store falls back to the database
+    assert sorted(store.upcoming_reminders(0)) == sorted(db.upcoming_reminders(0))
+
+
+def test_apply_takes_in_changes_from_elsewhere(store):
+    store.apply([(10, "Insulin", "2099-02-01", "08:00 AM", due_timestamp("2099-02-01", "08:00 AM"), None)],
+                deleted=[2])
+    assert sorted(row[1] for row in store.rows.values()) == ["Insulin", "Upcoming"]
+    assert store.recurring_medicines() == []